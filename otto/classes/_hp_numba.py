@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Numba kernels for the one-step heuristic policies (infotaxis, space-aware infotaxis, mean distance).
+
+Numba is optional: if it is not installed, NUMBA_AVAILABLE is False and the policies use their NumPy implementation.
+Kernels are 2D only and assume the evidence (p_Poisson) and distance arrays are centered on the origin,
+with size 2N-1 along each axis (origin at index N-1).
+
+Actions are evaluated in parallel threads, their number is set by set_num_threads (all cores by default).
+"""
+
+import math
+import numpy as np
+
+try:
+    import numba
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        """Dummy decorator used when numba is not installed."""
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda f: f
+
+    prange = range
+
+# _____________________  parameters  _____________________
+EPSILON = 1e-10
+# ________________________________________________________
+
+
+def set_num_threads(n):
+    """Set the number of threads used by the parallel kernels in the calling thread (no effect without numba).
+
+    Args:
+        n (int): number of threads, at most the number of cores
+    """
+    if NUMBA_AVAILABLE:
+        numba.set_num_threads(min(n, numba.config.NUMBA_NUM_THREADS))
+
+
+@njit(fastmath=True, cache=True)
+def _bayes_stats(p_source, total, p_Poisson, distance_array, ax, ay, with_entropy, with_distance):
+    """Statistics of the belief updated after a move to (ax, ay) where the source is not found.
+
+    Fuses the zero-out of the agent cell, the renormalization, the Bayesian update and the reductions
+    in a single pass over the grid, using H = log2(p_hit) - sum(v log2 v) / p_hit for the entropy of v / p_hit.
+
+    Returns:
+        p_hit (ndarray): probability of each hit value
+        entropy (ndarray): entropy of the updated belief for each hit value (zeros if not with_entropy)
+        distance (ndarray): mean distance to the source for each hit value (zeros if not with_distance)
+    """
+    nx, ny = p_source.shape
+    Nhits = p_Poisson.shape[0]
+    ox = (p_Poisson.shape[1] - 1) // 2 - ax
+    oy = (p_Poisson.shape[2] - 1) // 2 - ay
+    dx = (distance_array.shape[0] - 1) // 2 - ax
+    dy = (distance_array.shape[1] - 1) // 2 - ay
+
+    # renormalization of p_source for not finding the source in (ax, ay)
+    s = total - p_source[ax, ay]
+    c = 1.0 / s if s > EPSILON else 1.0
+
+    p_hit = np.zeros(Nhits)
+    vlogv = np.zeros(Nhits)
+    distance = np.zeros(Nhits)
+    for i in range(nx):
+        for j in range(ny):
+            if i == ax and j == ay:
+                continue
+            p = c * p_source[i, j]
+            d = distance_array[dx + i, dy + j] if with_distance else 0.0
+            for h in range(Nhits):
+                v = p * p_Poisson[h, ox + i, oy + j]
+                p_hit[h] += v
+                if with_distance:
+                    distance[h] += v * d
+                if with_entropy and v > 0.0:
+                    vlogv[h] += v * math.log2(v)
+
+    entropy = np.zeros(Nhits)
+    for h in range(Nhits):
+        if p_hit[h] > EPSILON:
+            distance[h] /= p_hit[h]
+            if with_entropy:
+                entropy[h] = math.log2(p_hit[h]) - vlogv[h] / p_hit[h]
+        elif with_entropy:
+            entropy[h] = - vlogv[h]
+
+    return p_hit, entropy, distance
+
+
+@njit(fastmath=True, cache=True, parallel=True)
+def infotaxis_kernel(p_source, p_Poisson, agent, moves):
+    """Expected entropy after each action (infotaxis).
+
+    Args:
+        p_source (ndarray): current belief, shape (nx, ny)
+        p_Poisson (ndarray): evidence array, shape (Nhits, 2nx+-1, 2ny+-1)
+        agent (ndarray): current agent location
+        moves (ndarray): offset of each action, shape (Nactions, 2)
+
+    Returns:
+        expected_S (ndarray): expected entropy after each action
+        move_possible (ndarray): whether each action is allowed
+    """
+    Nactions = moves.shape[0]
+    nx, ny = p_source.shape
+    expected_S = np.zeros(Nactions)
+    move_possible = np.zeros(Nactions, dtype=np.bool_)
+    total = p_source.sum()
+    dummy = np.zeros((1, 1))
+    for a in prange(Nactions):
+        ax = agent[0] + moves[a, 0]
+        ay = agent[1] + moves[a, 1]
+        if ax < 0 or ax >= nx or ay < 0 or ay >= ny:
+            continue
+        move_possible[a] = True
+        p_end = p_source[ax, ay]
+        if p_end > 1 - EPSILON:
+            # force the agent to go the source (essentially never used)
+            expected_S[a] = -EPSILON
+            continue
+        p_hit, entropy, _ = _bayes_stats(p_source, total, p_Poisson, dummy, ax, ay, True, False)
+        expected_S[a] = (1.0 - p_end) * np.sum(p_hit * entropy)
+    return expected_S, move_possible
+
+
+@njit(fastmath=True, cache=True, parallel=True)
+def space_aware_kernel(p_source, p_Poisson, distance_array, agent, moves):
+    """Expected log2 of the empirical value proxy after each action (space-aware infotaxis).
+
+    Same arguments as :func:`infotaxis_kernel`, plus distance_array of shape (2nx+-1, 2ny+-1).
+
+    Returns:
+        to_minimize (ndarray): quantity to minimize for each action
+        move_possible (ndarray): whether each action is allowed
+    """
+    Nactions = moves.shape[0]
+    nx, ny = p_source.shape
+    to_minimize = np.zeros(Nactions)
+    move_possible = np.zeros(Nactions, dtype=np.bool_)
+    total = p_source.sum()
+    for a in prange(Nactions):
+        ax = agent[0] + moves[a, 0]
+        ay = agent[1] + moves[a, 1]
+        if ax < 0 or ax >= nx or ay < 0 or ay >= ny:
+            continue
+        move_possible[a] = True
+        p_end = p_source[ax, ay]
+        if p_end > 1 - EPSILON:
+            # force the agent to go the source (essentially never used)
+            to_minimize[a] = -EPSILON
+            continue
+        p_hit, entropy, distance = _bayes_stats(p_source, total, p_Poisson, distance_array, ax, ay, True, True)
+        expected_value = 0.0
+        for h in range(p_hit.shape[0]):
+            value = distance[h] + 2.0 ** (entropy[h] - 1) - 0.5
+            if value > 0.0:
+                value = math.log2(value)
+            expected_value += (1.0 - p_end) * p_hit[h] * value
+        to_minimize[a] = expected_value
+    return to_minimize, move_possible
+
+
+@njit(fastmath=True, cache=True, parallel=True)
+def mean_distance_kernel(p_source, p_Poisson, distance_array, agent, moves):
+    """Expected mean distance to the source after each action (mean distance policy).
+
+    Same arguments and returns as :func:`space_aware_kernel`.
+    """
+    Nactions = moves.shape[0]
+    nx, ny = p_source.shape
+    to_minimize = np.zeros(Nactions)
+    move_possible = np.zeros(Nactions, dtype=np.bool_)
+    total = p_source.sum()
+    for a in prange(Nactions):
+        ax = agent[0] + moves[a, 0]
+        ay = agent[1] + moves[a, 1]
+        if ax < 0 or ax >= nx or ay < 0 or ay >= ny:
+            continue
+        move_possible[a] = True
+        p_end = p_source[ax, ay]
+        if p_end > 1 - EPSILON:
+            # force the agent to go the source (essentially never used)
+            to_minimize[a] = -EPSILON
+            continue
+        p_hit, _, distance = _bayes_stats(p_source, total, p_Poisson, distance_array, ax, ay, False, True)
+        to_minimize[a] = (1.0 - p_end) * np.sum(p_hit * distance)
+    return to_minimize, move_possible
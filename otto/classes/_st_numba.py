@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Numba kernels for the belief update and the hit sampling of the source-tracking POMDP.
+
+Numba is optional: if it is not installed, NUMBA_AVAILABLE is False and SourceTracking uses its NumPy implementation.
+"""
+
+import math
+import numpy as np
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        """Dummy decorator used when numba is not installed."""
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda f: f
+
+# _____________________  parameters  _____________________
+EPSILON = 1e-10
+# ________________________________________________________
+
+
+@njit(fastmath=True, cache=True)
+def fused_update(p_source, p_evidence, ax, ay):
+    """Bayesian update of a 2D belief in place, for not finding the source in (ax, ay) and receiving a hit.
+
+    A first pass zeroes the agent cell, multiplies by the evidence, clips round-off negatives and accumulates
+    the norm and sum(v log2 v), a second pass normalizes.
+
+    Args:
+        p_source (ndarray): belief, shape (nx, ny), modified in place
+        p_evidence (ndarray): probability of the hit received for each source location, shape (nx, ny)
+        ax, ay (int): position of the agent
+
+    Returns:
+        entropy (float): entropy of the updated belief
+    """
+    nx, ny = p_source.shape
+    p_source[ax, ay] = 0.0
+    total = 0.0
+    vlogv = 0.0
+    for i in range(nx):
+        for j in range(ny):
+            v = p_source[i, j] * p_evidence[i, j]
+            if -1e-15 < v < 0.0:
+                v = 0.0
+            p_source[i, j] = v
+            total += v
+            if v > 0.0:
+                vlogv += v * math.log2(v)
+
+    if total > EPSILON:
+        inv = 1.0 / total
+        for i in range(nx):
+            for j in range(ny):
+                p_source[i, j] *= inv
+        return math.log2(total) - vlogv * inv
+    return - vlogv
+
+
+@njit(cache=True)
+def draw_poisson_hit(mu, u, Nhits):
+    """Number of hits drawn by inversion of the Poisson CDF, the last value gathering the tail of the distribution.
+
+    Args:
+        mu (float): mean number of hits
+        u (float): uniform random number in [0, 1)
+        Nhits (int): number of possible hit values
+
+    Returns:
+        hit (int): number of hits, between 0 and Nhits - 1
+    """
+    term = math.exp(-mu)
+    cdf = term
+    for h in range(Nhits - 1):
+        if u < cdf:
+            return h
+        term *= mu / (h + 1)
+        cdf += term
+    return Nhits - 1
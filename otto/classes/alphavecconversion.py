@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Conversion of Perseus or Sarsop policies to the files loaded by AlphaVecPolicy (used by the converters)."""
+
+import io
+import os
+import json
+import numpy as np
+from scipy.sparse import csr_matrix
+
+# _____________________  parameters  _____________________
+ACTIONS = np.array([[-1, 0], [1, 0], [0, -1], [0, 1]])  # displacement for each action of SourceTracking
+# action for each displacement (dx, dy) in {-1, 0, 1}^2, at index 3 * (dx + 1) + (dy + 1) (-1 if not defined)
+ACTION_TABLE = -np.ones(9, dtype=np.int8)
+ACTION_TABLE[3 * (ACTIONS[:, 0] + 1) + (ACTIONS[:, 1] + 1)] = np.arange(len(ACTIONS))
+N_PRUNE_SAMPLES = 32  # number of weights compared first when pruning dominated alpha vectors
+PRUNE_BLOCK = 256  # number of alpha vectors compared at once on all weights when pruning
+# ________________________________________________________
+
+
+def convert_alphavecs(alphavecs, output, prune=False, sparse_density=0.3):
+    """Fill output with the alpha vectors and their actions.
+
+    Args:
+        alphavecs (list of alpha_vec): alpha vectors, with attributes data (weights) and action (displacement)
+        output (dict): metadata of the policy, "alphas" and "actions" are set (or the CSR arrays if sparse)
+        prune (bool, optional):
+            whether to remove the dominated alpha vectors (see prune_dominated) (default=False)
+        sparse_density (float, optional):
+            alpha vectors are saved in CSR format if the fraction of nonzero weights is lower than this (default=0.3)
+
+    Returns:
+        output (dict): output, with the alpha vectors and their actions
+    """
+    # alpha vectors and their displacements, each stacked with a single bulk copy
+    output["alphas"] = np.asarray([alphavec.data for alphavec in alphavecs])
+    moves = np.asarray([alphavec.action for alphavec in alphavecs], dtype=float)  # cast once checked
+    output["actions"] = actions_from_moves(moves)
+
+    if prune:
+        output["alphas"], output["actions"] = prune_dominated(output["alphas"], output["actions"])
+
+    # alpha vectors with few nonzero weights are saved in CSR format
+    if np.count_nonzero(output["alphas"]) < sparse_density * output["alphas"].size:
+        alphas = output.pop("alphas")
+        alpha_csr = csr_matrix(alphas.reshape(len(alphas), -1))
+        output["alphas_data"] = alpha_csr.data
+        output["alphas_indices"] = alpha_csr.indices
+        output["alphas_indptr"] = alpha_csr.indptr
+        output["alphas_shape"] = np.array(alphas.shape)
+    return output
+
+
+def actions_from_moves(moves):
+    """Return the action of each displacement, all displacements being checked at once.
+
+    Args:
+        moves (ndarray): displacements, with shape (n_alphas, 2), non-integer ones being rejected
+
+    Returns:
+        actions (ndarray): actions, with shape (n_alphas,) and dtype int8
+    """
+    moves = np.asarray(moves, dtype=float)
+    valid = np.all((moves == np.round(moves)) & (np.abs(moves) <= 1), axis=1)
+    index = np.where(valid[:, np.newaxis], moves, 0).astype(ACTIONS.dtype)
+    actions = np.where(valid, ACTION_TABLE[3 * (index[:, 0] + 1) + (index[:, 1] + 1)], -1).astype(np.int8)
+    if np.any(actions < 0):
+        raise Exception("These actions are not defined: " + str(np.unique(moves[actions < 0], axis=0).tolist()))
+    return actions
+
+
+def prune_dominated(alphas, actions):
+    """Remove the alpha vectors that are pointwise dominated by another one (they are never the best for any belief).
+
+    Candidates are examined by decreasing sum, since a dominating vector has a larger sum. Each candidate is first
+    compared with the kept vectors on a few sampled weights, which rules out almost all of them, and then on all
+    weights for the remaining ones, by blocks of PRUNE_BLOCK vectors (so that memory stays bounded).
+
+    Args:
+        alphas (ndarray): alpha vectors, with shape (n_alphas, ...)
+        actions (ndarray): action of each alpha vector, with shape (n_alphas,)
+
+    Returns:
+        alphas (ndarray): alpha vectors kept, in their original order
+        actions (ndarray): actions of the alpha vectors kept
+    """
+    flat = alphas.reshape(len(alphas), -1)
+    order = np.argsort(-np.sum(flat, axis=1), kind="stable")
+    columns = np.random.default_rng(0).choice(flat.shape[1], size=min(N_PRUNE_SAMPLES, flat.shape[1]), replace=False)
+    samples = np.empty((len(columns), len(flat)), dtype=flat.dtype)  # sampled weights of the kept vectors
+    kept = np.empty(len(flat), dtype=np.intp)
+    n_kept = 0
+    for i in order:
+        x = flat[i, columns]
+        candidates = np.flatnonzero(samples[0, :n_kept] >= x[0])
+        for c in range(1, len(columns)):
+            if len(candidates) == 0:
+                break
+            candidates = candidates[samples[c, candidates] >= x[c]]
+        dominated = False
+        for start in range(0, len(candidates), PRUNE_BLOCK):
+            block = kept[candidates[start:start + PRUNE_BLOCK]]
+            if np.any(np.all(flat[block] >= flat[i], axis=1)):
+                dominated = True
+                break
+        if not dominated:
+            samples[:, n_kept] = x
+            kept[n_kept] = i
+            n_kept += 1
+    kept = np.sort(kept[:n_kept])
+    return alphas[kept], actions[kept]
+
+
+def save(output, filename):
+    """Save arrays and scalar metadata in a .npz archive (readable without pickle), compressed with zstd if
+    filename ends with '.zst' (faster to load than the default zlib compression), or in a directory of .npy
+    files (memory-mapped when loaded) plus meta.json if filename has no extension."""
+    if not os.path.splitext(filename)[1]:
+        os.makedirs(filename, exist_ok=True)
+        meta = {key: value for key, value in output.items() if not isinstance(value, np.ndarray)}
+        meta["arrays"] = [key for key in output if isinstance(output[key], np.ndarray)]
+        for key in meta["arrays"]:
+            np.save(os.path.join(filename, key + ".npy"), output[key])
+        with open(os.path.join(filename, "meta.json"), "w") as f:
+            json.dump(meta, f, indent=4)
+    elif filename.endswith('.zst'):
+        import zstandard  # optional dependency, only needed for zstd compression
+        buffer = io.BytesIO()
+        np.savez(buffer, **output)
+        with open(filename, 'wb') as f:
+            f.write(zstandard.ZstdCompressor(level=3, threads=-1).compress(buffer.getbuffer()))
+    else:
+        np.savez_compressed(filename, **output)
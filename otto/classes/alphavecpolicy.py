@@ -2,45 +2,172 @@
 # -*- coding: utf-8 -*-
 """Definition of the policies based on alpha vectors (generated by Perseus or Sarsop solvers)"""
 
+import io
 import os
+import json
+import itertools
 import numpy as np
 import pickle
 from copy import deepcopy
-import tensorflow as tf
+from scipy.sparse import csr_matrix
 from .policy import Policy, policy_name
 
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        """Dummy decorator used when numba is not installed."""
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda f: f
+
 # _____________________  parameters  _____________________
 EPSILON = 1e-10
 EPSILON_CHOICE = EPSILON
+N_RESCORED = 4  # number of best alpha vectors rescored in full precision when using low_precision
+ALPHA_DTYPE = np.float64  # dtype of alpha vectors and beliefs, np.float32 halves memory traffic but loses precision
+ALIGNMENT = 64  # alignment (in bytes) of the alpha matrices, for aligned SIMD loads
 # ________________________________________________________
 
 
-def einsum_value_single_belief(belief, alphas):
-    if len(belief.shape) == 3:
-        dot = np.einsum('klm,jklm->j', belief, alphas)
-        index = np.argmax(dot)
-        value = dot[index]
-        return value, index
-    dot = np.einsum('kl,jkl->j', belief, alphas)
-    index = np.argmax(dot)
+def aligned_array(array, dtype, alignment=ALIGNMENT):
+    """Return array as a C-contiguous array of the given dtype whose data is aligned on alignment bytes.
+
+    The array is returned as is if it already satisfies these requirements, otherwise it is copied.
+    """
+    array = np.asarray(array)
+    if array.dtype == dtype and array.flags.c_contiguous and array.ctypes.data % alignment == 0:
+        return array
+    nbytes = array.size * np.dtype(dtype).itemsize
+    buffer = np.empty(nbytes + alignment, dtype=np.uint8)
+    offset = -buffer.ctypes.data % alignment
+    aligned = buffer[offset:offset + nbytes].view(dtype).reshape(array.shape)
+    aligned[...] = array
+    return aligned
+
+
+def matmul_value_single_belief(belief, alpha_mat):
+    """Return the value of a belief and the index of the best alpha vector.
+
+    Args:
+        belief (ndarray): belief, with any shape of size n_weights
+        alpha_mat (ndarray or csr_matrix): alpha vectors, with shape (n_alphas, n_weights)
+    """
+    dot = alpha_mat @ belief.ravel()
+    index = dot.argmax()
     value = dot[index]
     return value, index
 
 
+@njit(cache=True, fastmath=True)
+def best_alpha(belief_flat, alpha_mat):
+    """Return the value of a belief and the index of the best alpha vector, in a single pass over alpha_mat.
+
+    Args:
+        belief_flat (ndarray): flattened belief, with shape (n_weights,)
+        alpha_mat (ndarray): alpha vectors, with shape (n_alphas, n_weights)
+    """
+    best = -np.inf
+    best_index = 0
+    for j in range(alpha_mat.shape[0]):
+        s = 0.0
+        for k in range(alpha_mat.shape[1]):
+            s += belief_flat[k] * alpha_mat[j, k]
+        if s > best:
+            best = s
+            best_index = j
+    return best, best_index
+
+
+@njit(cache=True, fastmath=True)
+def int8_matvec(alpha_q, belief_flat):
+    """Return the products of int8 alpha vectors with a belief, accumulated in double precision.
+
+    Args:
+        alpha_q (ndarray): quantized alpha vectors, with shape (n_alphas, n_weights)
+        belief_flat (ndarray): flattened belief, with shape (n_weights,)
+    """
+    dot = np.empty(alpha_q.shape[0])
+    for j in range(alpha_q.shape[0]):
+        s = 0.0
+        for k in range(alpha_q.shape[1]):
+            s += belief_flat[k] * alpha_q[j, k]
+        dot[j] = s
+    return dot
+
+
 class ValueFunction:
     """
     Args:
-            alphas (list of ndarray):
-                list of alpha vectors
+            alphas (list of ndarray, or csr_matrix):
+                list of alpha vectors, or alpha vectors in CSR format with shape (n_alphas, n_weights), in which case
+                no dense copy is made and all values are computed as sparse matrix-vector products
             actions (list of int):
                 list of action associated to alpha vectors
-            alpha_array (ndarray):
-                alpha vectors, with shape (n_alphas, n_grid_x, n_grid_y)
+            device ('cpu' or 'gpu', optional):
+                where to compute values with parallel=True, 'gpu' uses TensorFlow if a GPU is available (default='cpu')
+            low_precision (bool or 'int8', optional):
+                whether to scan alpha vectors in float32 on cpu or bfloat16 on gpu with parallel=True,
+                the best candidates being rescored in full precision,
+                'int8' scans int8 alpha vectors (with a scale per vector) on cpu and rescores all the candidates
+                that the quantization error cannot rule out, so that the result is exact (default=False)
+            sparse (bool, optional):
+                whether to compute values with parallel=True as a sparse (CSR) matrix-vector product,
+                for alpha vectors with few nonzero weights (default=False)
+            alpha_array (ndarray or None):
+                alpha vectors, with shape (n_alphas, n_grid_x, n_grid_y) (None if alphas is a csr_matrix)
     """
-    def __init__(self, alphas, actions):
+    def __init__(self, alphas, actions, device='cpu', low_precision=False, sparse=False):
+        if device not in ('cpu', 'gpu'):
+            raise Exception("device must be 'cpu' or 'gpu'")
         self.alphas = alphas
         self.actions = actions
-        self.alpha_array = np.array(alphas)
+        self.device = device
+        self.low_precision = low_precision
+        self.sparse = sparse or isinstance(alphas, csr_matrix)
+        if isinstance(alphas, csr_matrix):
+            self.alpha_array = None
+        else:
+            self.alpha_array = np.asarray(alphas)  # no copy of an array (possibly memory-mapped)
+        self._set_alpha_mat()
+
+    def _set_alpha_mat(self):
+        self._alpha_mat_low = None
+        self._alpha_scale = None
+        self._alpha_tf = None
+        self._belief_tf = None
+        if self.alpha_array is None:
+            # alpha vectors in CSR format only (no dense _alpha_mat)
+            if self.low_precision or self.device == 'gpu':
+                raise Exception("low_precision and device='gpu' require dense alpha vectors")
+            self._alpha_mat = None
+            self._alpha_sparse = csr_matrix(self.alphas, dtype=ALPHA_DTYPE)
+            return
+
+        # alpha vectors flattened to a 2D matrix (a view of alpha_array), shape (n_alphas, n_weights)
+        self.alpha_array = aligned_array(self.alpha_array, ALPHA_DTYPE)
+        self._alpha_mat = self.alpha_array.reshape(len(self.alpha_array), -1)
+        if self.low_precision == 'int8':
+            # alpha = scale * alpha_q + r, with |r| <= scale / 2
+            self._alpha_scale = np.max(np.abs(self._alpha_mat), axis=1) / 127.0
+            self._alpha_scale[self._alpha_scale == 0.0] = 1.0
+            self._alpha_mat_low = aligned_array(np.round(self._alpha_mat / self._alpha_scale[:, np.newaxis]), np.int8)
+        elif self.low_precision:
+            self._alpha_mat_low = aligned_array(self._alpha_mat, np.float32)
+        self._alpha_sparse = csr_matrix(self._alpha_mat) if self.sparse else None
+
+        # persistent copies on GPU of the alpha vectors and of a belief buffer
+        if self.device == 'gpu':
+            # TensorFlow is imported only here: once initialized, it makes forking worker processes unsafe
+            import tensorflow as tf
+            if tf.config.list_physical_devices('GPU'):
+                dtype = tf.bfloat16 if self.low_precision else tf.float32
+                with tf.device('/GPU:0'):
+                    self._alpha_tf = tf.constant(self._alpha_mat, dtype=dtype)
+                    self._belief_tf = tf.Variable(tf.zeros(self._alpha_mat.shape[1], dtype=dtype))
 
     def value(self, belief, alpha_set=None, parallel=False):
         """Compute the current estimated value of a belief.
@@ -49,9 +176,29 @@ class ValueFunction:
         """
         if alpha_set is None:
             alpha_set = self.alphas
+        belief = np.ascontiguousarray(belief, dtype=ALPHA_DTYPE)  # no copy if already contiguous
+
+        if self._alpha_mat is None and alpha_set is self.alphas:
+            value, index = matmul_value_single_belief(belief, self._alpha_sparse)
+            return value, int(index)
+
+        elif parallel:
+            if self._alpha_tf is not None:
+                return self.value_gpu(belief)
+            if self._alpha_scale is not None:
+                return self._rescore(belief, self._int8_candidates(belief))
+            if self.low_precision:
+                dot = self._alpha_mat_low @ belief.ravel().astype(np.float32)
+                k = self._n_rescored()
+                return self._rescore(belief, np.argpartition(dot, -k)[-k:])
+            if self._alpha_sparse is not None:
+                value, index = matmul_value_single_belief(belief, self._alpha_sparse)
+            else:
+                value, index = matmul_value_single_belief(belief, self._alpha_mat)
+            return value, int(index)
 
-        if parallel:
-            value, index = einsum_value_single_belief(belief, self.alpha_array)
+        elif NUMBA_AVAILABLE and alpha_set is self.alphas:
+            value, index = best_alpha(belief.ravel(), self._alpha_mat)
             return value, int(index)
 
         else:
@@ -66,11 +213,67 @@ class ValueFunction:
                 raise RuntimeError('best index is None')
             return best_val, best_index
 
+    def value_batch(self, beliefs):
+        """Compute the current estimated values of a batch of beliefs with a single matrix product.
+
+        Args:
+            beliefs (ndarray): beliefs, with shape (batch_size, n_grid_x, n_grid_y)
+
+        Returns:
+            values (ndarray): values of the beliefs, with shape (batch_size,)
+            indices (ndarray): indices of the best alpha vectors, with shape (batch_size,)
+        """
+        beliefs = np.ascontiguousarray(beliefs, dtype=ALPHA_DTYPE)
+        alpha_mat = self._alpha_mat if self._alpha_sparse is None else self._alpha_sparse
+        dot = alpha_mat @ beliefs.reshape(len(beliefs), -1).T  # (n_alphas, batch_size)
+        indices = np.argmax(dot, axis=0)
+        values = dot[indices, np.arange(len(beliefs))]
+        return values, indices
+
+    def value_gpu(self, belief):
+        """Compute the current estimated value of a belief on GPU (requires device='gpu').
+
+        Returns:
+            value (float): value of the belief
+            index (int): index of the best alpha vector
+        """
+        if self._alpha_tf is None:
+            raise Exception("value_gpu requires device='gpu' and an available GPU")
+        import tensorflow as tf  # already imported by _set_alpha_mat
+        self._belief_tf.assign(tf.cast(belief.ravel(), self._belief_tf.dtype))
+        dot = tf.linalg.matvec(self._alpha_tf, self._belief_tf)
+        if self.low_precision:
+            candidates = tf.math.top_k(tf.cast(dot, tf.float32), k=self._n_rescored()).indices
+            return self._rescore(belief, candidates.numpy())
+        index = int(tf.argmax(dot))
+        return float(dot[index]), index
+
+    def _int8_candidates(self, belief):
+        # alpha vectors whose value may be the largest, given the quantization error bound
+        belief_flat = belief.ravel()
+        if NUMBA_AVAILABLE:
+            dot = int8_matvec(self._alpha_mat_low, belief_flat)
+        else:
+            dot = self._alpha_mat_low @ belief_flat
+        dot *= self._alpha_scale
+        error = (0.5 + EPSILON) * self._alpha_scale * np.sum(np.abs(belief_flat))
+        return np.flatnonzero(dot + error >= np.max(dot - error))
+
+    def _n_rescored(self):
+        return min(N_RESCORED, len(self._alpha_mat))
+
+    def _rescore(self, belief, candidates):
+        # value of the best candidate alpha vectors, in full precision
+        dot = self._alpha_mat[candidates] @ belief.ravel()
+        best = np.argmax(dot)
+        return dot[best], int(candidates[best])
+
     def load(self, filename):
         with open(filename + '.pkl', 'rb') as f:
             vf = pickle.load(f)
             self.alphas = vf.alphas
             self.alpha_array = vf.alpha_array
+        self._set_alpha_mat()
 
 
 class AlphaVecPolicy(Policy):
@@ -81,7 +284,15 @@ class AlphaVecPolicy(Policy):
             env (SourceTracking):
                 an instance of the source-tracking POMDP
             filepath (str):
-                path to the file containing the Perseus policy
+                path to the file containing the Perseus or Sarsop policy (.npz, .npz.zst or directory of .npy
+                files written by the converters, or .pkl), the file is loaded once per process and shared between
+                instances
+            parallel (bool, optional):
+                whether to compute values with a single matrix-vector product (default=False)
+            device ('cpu' or 'gpu', optional):
+                where to compute values if parallel, 'gpu' is used only if a GPU is available (default='cpu')
+            low_precision (bool or 'int8', optional):
+                whether to scan alpha vectors in reduced precision if parallel, see ValueFunction (default=False)
 
 
         Attributes:
@@ -105,19 +316,33 @@ class AlphaVecPolicy(Policy):
 
 
     """
+    # policies loaded in this process (value function and metadata), shared by all instances using the same file
+    _loaded = {}
+
     def __init__(
             self,
             env,
             filepath,
             parallel=False,
+            device='cpu',
+            low_precision=False,
     ):
         super().__init__(policy=-2)  # sets policy_index and policy_name
 
         self.env = env
         self.parallel = parallel
 
-        alphavec = self._load(filepath)
-        self.vf = ValueFunction(alphas=alphavec["alphas"], actions=alphavec["actions"])
+        key = (os.path.abspath(filepath), device, low_precision)
+        if key not in AlphaVecPolicy._loaded:
+            alphavec = self._load(filepath)
+            alphas = alphavec.pop("alphas")
+            if isinstance(alphas, csr_matrix) and (low_precision or device == 'gpu'):
+                alphas = alphas.toarray().reshape(alphavec["alphas_shape"])  # these modes need dense alpha vectors
+            alphavec.pop("alphas_shape", None)
+            vf = ValueFunction(alphas=alphas, actions=alphavec.pop("actions"), device=device,
+                               low_precision=low_precision)
+            AlphaVecPolicy._loaded[key] = (vf, alphavec)
+        self.vf, alphavec = AlphaVecPolicy._loaded[key]
         self.solver = alphavec["solver"]
         self.discount = alphavec["discount"]
         self.shaping = alphavec["shaping"]
@@ -125,11 +350,17 @@ class AlphaVecPolicy(Policy):
 
         self.policy_name = self.solver
 
+        # destination indices of p in the belief, for each agent location (see _alphavec_belief)
+        self._belief_rows = self._belief_index_table(self.env.shape[0])
+        self._belief_cols = self._belief_index_table(self.env.shape[1])
+        self._belief_buf = np.zeros([2 * n - 1 for n in self.env.shape], dtype=ALPHA_DTYPE)
+        self._belief_blocks_cache = {}
+
         self.policy_long_name = self.solver + \
                            " (discount=" + str(self.discount) + \
                            ", shaping=" + str(self.shaping_coef) + self.shaping + \
-                           ", alphas=" + str(len(self.vf.alphas)) + \
-                           ", n_weights=" + str(np.prod(self.vf.alpha_array.shape)) + ")"
+                           ", alphas=" + str(len(self.vf.actions)) + \
+                           ", n_weights=" + str(len(self.vf.actions) * self._belief_buf.size) + ")"
 
     def _choose_action(self, ):
 
@@ -141,6 +372,20 @@ class AlphaVecPolicy(Policy):
 
         return action_chosen
 
+    def choose_action_batch(self, p_sources, agents):
+        """Choose actions for a batch of beliefs (e.g., from independent episodes), sharing a single matrix product.
+
+        Args:
+            p_sources (ndarray): probability distributions of the source, with shape (batch_size, n_grid_x, n_grid_y)
+            agents (ndarray): agent locations, with shape (batch_size, 2)
+
+        Returns:
+            actions_chosen (ndarray): chosen actions, with shape (batch_size,)
+        """
+        beliefs = self._alphavec_belief_batch(p_sources, agents)
+        _, best_indices = self.vf.value_batch(beliefs)
+        return np.asarray(self.vf.actions)[best_indices]
+
     # __ POLICY DEFINITIONS _______________________________________
 
     def _get_alphavec_action(self, p, agent):
@@ -149,14 +394,73 @@ class AlphaVecPolicy(Policy):
         return self.vf.actions[best_index], value
 
     def _alphavec_belief(self, p, agent):
-        dims = p.shape
-        b = np.pad(p, ((0, dims[0] - 1), (0, dims[1] - 1)))
-        b = np.flip(b)
-        b = np.roll(b, (1 + agent[0], 1 + agent[1]), axis=(0, 1))
-        return b
+        """Belief used by the alpha vectors: p padded to size 2N - 1, flipped and rolled by 1 + agent.
+
+        The result is written in a persistent buffer, which is overwritten at the next call (do not modify it).
+        """
+        self._belief_buf.fill(0.0)
+        for dst, src in self._belief_blocks(agent):
+            np.copyto(self._belief_buf[dst], p[src])
+        return self._belief_buf
+
+    def _belief_blocks(self, agent):
+        # along each axis, p[k] lands in (agent - k) mod (2n - 1): p[agent::-1] is copied to [0, agent]
+        # and p[n-1:agent:-1] wraps around to [agent + n, 2n - 1), hence 2 ** Ndim flipped blocks (cached)
+        key = tuple(agent)
+        blocks = self._belief_blocks_cache.get(key)
+        if blocks is None:
+            per_axis = [
+                [(slice(0, a + 1), slice(a, None, -1)), (slice(a + n, 2 * n - 1), slice(n - 1, a, -1))]
+                for a, n in zip(key, self.env.shape)
+            ]
+            blocks = [tuple(zip(*block)) for block in itertools.product(*per_axis)]
+            self._belief_blocks_cache[key] = blocks
+        return blocks
+
+    def _alphavec_belief_batch(self, p_sources, agents):
+        """Same as _alphavec_belief for a batch of p with shape (batch_size, n_grid_x, n_grid_y)."""
+        agents = np.asarray(agents)
+        beliefs = np.zeros((len(p_sources),) + self._belief_buf.shape, dtype=self._belief_buf.dtype)
+        batch = np.arange(len(p_sources))[:, np.newaxis, np.newaxis]
+        rows = self._belief_rows[agents[:, 0]][:, :, np.newaxis]
+        cols = self._belief_cols[agents[:, 1]][:, np.newaxis, :]
+        beliefs[batch, rows, cols] = p_sources
+        return beliefs
+
+    @staticmethod
+    def _belief_index_table(n):
+        # table[a, k] = (a - k) mod (2n - 1) is where p[k] lands in the belief when the agent is in a
+        return (np.arange(n)[:, np.newaxis] - np.arange(n)[np.newaxis, :]) % (2 * n - 1)
 
     def _load(self, filename):
-        with open(filename, 'rb') as f:
-            perseus = pickle.load(f)
-        return perseus
+        if os.path.isdir(filename):
+            # scalar metadata in meta.json, arrays in .npy files memory-mapped read-only (loaded lazily by the OS
+            # and shared by forked processes)
+            with open(os.path.join(filename, 'meta.json')) as f:
+                alphavec = json.load(f)
+            for key in alphavec.pop("arrays"):
+                alphavec[key] = np.load(os.path.join(filename, key + '.npy'), mmap_mode='r')
+        elif filename.endswith('.npz') or filename.endswith('.npz.zst'):
+            if filename.endswith('.zst'):
+                import zstandard  # optional dependency, only needed for zstd-compressed policies
+                with open(filename, 'rb') as f:
+                    source = io.BytesIO(zstandard.ZstdDecompressor().decompress(f.read()))
+            else:
+                source = filename
+            with np.load(source) as data:
+                # 0-d arrays hold the scalar metadata (solver, discount, shaping, shaping_coef)
+                alphavec = {key: data[key].item() if data[key].ndim == 0 else data[key] for key in data.files}
+        else:
+            with open(filename, 'rb') as f:
+                perseus = pickle.load(f)
+            return perseus
+        if "alphas_data" in alphavec:
+            # alpha vectors saved in CSR format by the converters, kept in this format
+            shape = tuple(int(n) for n in alphavec["alphas_shape"])
+            alphavec["alphas_shape"] = shape
+            alphavec["alphas"] = csr_matrix(
+                (alphavec.pop("alphas_data"), alphavec.pop("alphas_indices"), alphavec.pop("alphas_indptr")),
+                shape=(shape[0], int(np.prod(shape[1:]))),
+            )
+        return alphavec
 
@@ -3,16 +3,42 @@
 """Definition of heuristic policies such as infotaxis."""
 
 import numpy as np
-import random
-from copy import deepcopy
+import hashlib
+from collections import OrderedDict
+from scipy.special import xlogy
 from .policy import Policy, policy_name
+from ._hp_numba import NUMBA_AVAILABLE, infotaxis_kernel, space_aware_kernel, mean_distance_kernel
 
 # _____________________  parameters  _____________________
 EPSILON = 1e-10
 EPSILON_CHOICE = EPSILON
+REL_TOL_CHOICE = 2e-6  # actions whose values differ by less than this (relative to scale) are tied, first one chosen
+REL_TOL_CHOICE_N_STEPS = 1e-5  # same for n-steps infotaxis, whose rounding errors compound over the tree
+DECISION_CACHE_SIZE = 10000  # max number of infotaxis decisions memoized (least recently used are discarded)
 # ________________________________________________________
 
 
+def _argmin_choice(values, scale=None, rtol=REL_TOL_CHOICE):
+    """Return the first action whose value is within tolerance of the minimum.
+
+    Values are computed from float32 beliefs and evidence (rounding errors up to a few 1e-6 relative to scale), so
+    near-ties, such as exact ties of symmetric moves, are broken in favor of the lowest action index instead of by
+    rounding noise.
+
+    Args:
+        values (ndarray): value of each action (inf for forbidden moves)
+        scale (float, optional): magnitude of the quantities the values are computed from (default=max finite |values|)
+        rtol (float, optional): tolerance relative to scale (default=REL_TOL_CHOICE)
+    """
+    values = np.asarray(values, dtype=float)
+    finite = np.isfinite(values)
+    if not np.any(finite):
+        return int(np.argmin(values))
+    if scale is None:
+        scale = np.max(np.abs(values[finite]))
+    return int(np.flatnonzero(values <= np.min(values) + EPSILON_CHOICE + rtol * abs(scale))[0])
+
+
 class HeuristicPolicy(Policy):
     """
         A heuristic policy.
@@ -33,6 +59,9 @@ class HeuristicPolicy(Policy):
                 number of anticipated future moves (default=1), > 1 only for infotaxis
             discount (float or None, optional):
                 discount factor to use when steps_ahead> 1, automatically set if None (default=None)
+            cache_decisions (bool, optional):
+                whether to memoize the one-step infotaxis decisions for identical (p_source, agent), the memo being
+                shared by all instances of the process using the same environment parameters (default=False)
 
         Attributes:
             env (SourceTracking):
@@ -47,6 +76,8 @@ class HeuristicPolicy(Policy):
                 discount factor used for steps_ahead > 1, or None if steps_ahead = 1
 
     """
+    # memoized infotaxis decisions, shared by all instances of the process (see cache_decisions)
+    _infotaxis_cache = OrderedDict()
 
     def __init__(
             self,
@@ -54,6 +85,7 @@ class HeuristicPolicy(Policy):
             policy,
             steps_ahead=1,
             discount=None,
+            cache_decisions=False,
     ):
         super().__init__(policy=policy)  # sets policy_index and policy_name
 
@@ -71,6 +103,29 @@ class HeuristicPolicy(Policy):
         self.steps_ahead = int(steps_ahead)
         self.discount = discount
 
+        # offset of the agent position for each action, used to move the agent for all actions at once
+        center = [n // 2 for n in self.env.shape]
+        self._move_offsets = np.array(
+            [np.asarray(self.env._move(a, center)[0]) - center for a in range(self.env.Nactions)], dtype=np.int8
+        )
+        self._grid_shape = np.array(self.env.shape)
+        self._use_numba = NUMBA_AVAILABLE and self.env.Ndim == 2
+
+        # preallocated buffer for the belief updated after a move
+        self._p_scratch = np.empty(self.env.shape)
+
+        # slices used to extract N-size arrays from 2N-size arrays (evidence, distance), for each agent position
+        self._slice_cache = {}
+
+        # windows of distance_array centered on each agent position
+        self._dist_views = {}
+
+        # memoized infotaxis decisions (shared between episodes), keyed by the environment parameters and a hash of
+        # (p_source, agent)
+        self.cache_decisions = cache_decisions
+        self._env_key = (self.env.R_bar, self.env.V_bar, self.env.tau_bar, tuple(self.env.shape),
+                         self.env.norm_Poisson, self.env.Nhits)
+
     def _choose_action(self, ):
         if self.policy_index == 0:
             assert policy_name(self.policy_index) == "infotaxis"
@@ -102,7 +157,7 @@ class HeuristicPolicy(Policy):
 
         elif self.policy_index == 5:
             assert policy_name(self.policy_index) == "random walk"
-            action_chosen = random.randint(0, self.env.Nactions - 1)
+            action_chosen = int(self.env._rng.integers(self.env.Nactions))  # seeded with the environment
 
         elif self.policy_index == 6:
             assert policy_name(self.policy_index) == "greedy"
@@ -125,126 +180,139 @@ class HeuristicPolicy(Policy):
 
         return action_chosen
 
-    # __ POLICY DEFINITIONS _______________________________________
-    def _infotaxis(self):
-        """Original infotaxis, from Vergassola, Villermaux and Shraiman (Nature 2007)"""
-        delta_entropy = np.ones(self.env.Nactions) * float("inf")
-        for a in range(self.env.Nactions):
-            # moving agent
-            agent_, move_possible = self.env._move(a, self.env.agent)
-            if move_possible:
-                # calculating p_end
-                p_source_ = deepcopy(self.env.p_source)
-                p_end = p_source_[tuple(agent_)]
-                if p_end > 1 - EPSILON:
-                    # force the agent to go the source (essentially never used)
-                    expected_S = -EPSILON
-                else:
-                    # updating p_source for not finding source
-                    p_source_[tuple(agent_)] = 0
-                    if np.sum(p_source_) > EPSILON:
-                        p_source_ /= np.sum(p_source_)
+    # __ UTILITIES _______________________________________
+    def _slices(self, origin, size):
+        """Return the index extracting the N-size window centered on origin from an array of size 2N-1.
 
-                    # extracting the evidence matrix for Bayesian inference
-                    p_evidence = self.env._extract_N_from_2N(input=self.env.p_Poisson, origin=agent_)
+        Equivalent to env._extract_N_from_2N, but slices are computed once for each origin and cached.
 
-                    # updating p_source_ by Bayesian inference
-                    p_source_ = p_source_ * p_evidence
-                    p_hit = np.sum(p_source_, axis=tuple(range(1, p_source_.ndim)))
-                    for h in range(self.env.Nhits):
-                        if p_hit[h] > EPSILON:
-                            p_source_[h] /= p_hit[h]
+        Args:
+            origin (list of int): position of the agent
+            size (tuple of int): shape of the 2N-1 size array (leading axes, e.g. hits, are kept)
+
+        Returns:
+            index (tuple): index such that array[index] = env._extract_N_from_2N(array, origin)
+        """
+        key = (size[-self.env.Ndim:], tuple(origin))
+        index = self._slice_cache.get(key)
+        if index is None:
+            index = (Ellipsis,) + tuple(
+                slice((m - 1) // 2 - o, (m - 1) // 2 - o + n) for m, o, n in zip(key[0], origin, self.env.shape)
+            )
+            self._slice_cache[key] = index
+        return index
+
+    def _dist_view(self, agent):
+        """Return the N-size window of distance_array centered on agent (views are cached for each position)."""
+        key = tuple(agent)
+        view = self._dist_views.get(key)
+        if view is None:
+            view = self.distance_array[self._slices(key, self.distance_array.shape)]
+            self._dist_views[key] = view
+        return view
+
+    def _moves(self, agent):
+        """Move the agent for all actions at once (vectorized equivalent of env._move).
 
-                    # calculating entropy
-                    entropy_ = self.env._entropy(p_source_,
-                                             axes=tuple(range(1, p_source_.ndim)))
-                    expected_S = (1.0 - p_end) * np.sum(p_hit * entropy_)
+        Args:
+            agent (list of int): position of the agent
 
-                delta_entropy[a] = expected_S - self.env.entropy
+        Returns:
+            agents_ (ndarray): new position of the agent for each action, shape (Nactions, Ndim)
+            move_possible (ndarray): whether each move is allowed, shape (Nactions,)
+        """
+        agents_ = np.asarray(agent) + self._move_offsets
+        move_possible = np.all((agents_ >= 0) & (agents_ < self._grid_shape), axis=1)
+        return agents_, move_possible
 
-        # action_chosen = np.argwhere(np.abs(delta_entropy - np.min(delta_entropy)) < EPSILON_CHOICE).flatten()[0]
-        action_chosen = np.argmin(delta_entropy)
+    # __ POLICY DEFINITIONS _______________________________________
+    def _infotaxis(self):
+        """Original infotaxis, from Vergassola, Villermaux and Shraiman (Nature 2007)"""
+        if self.cache_decisions:
+            key = self._decision_key()
+            cache = HeuristicPolicy._infotaxis_cache
+            decision = cache.get(key)
+            if decision is not None:
+                cache.move_to_end(key)
+                return decision[0], decision[1].copy()
+            decision = self._infotaxis_uncached()
+            cache[key] = (decision[0], decision[1].copy())
+            if len(cache) > DECISION_CACHE_SIZE:
+                cache.popitem(last=False)
+            return decision
+        return self._infotaxis_uncached()
+
+    def _decision_key(self):
+        # hash of the belief, followed by the agent position
+        digest = hashlib.blake2b(np.ascontiguousarray(self.env.p_source).tobytes(), digest_size=16).digest()
+        return self._env_key, digest + np.asarray(self.env.agent, dtype=np.int64).tobytes()
+
+    def _infotaxis_uncached(self):
+        """Infotaxis decision, computed without the decision cache."""
+        Nactions, Ndim = self.env.Nactions, self.env.Ndim
+        p_source, p_Poisson, agent = self.env.p_source, self.env.p_Poisson, self.env.agent
+        if self._use_numba:
+            expected_S, move_possible = infotaxis_kernel(
+                p_source, p_Poisson, np.asarray(agent), self._move_offsets
+            )
+            delta_entropy = np.where(move_possible, expected_S - self.env.entropy, float("inf"))
+            action_chosen = _argmin_choice(delta_entropy, scale=self.env.entropy)
+            return action_chosen, -delta_entropy
+
+        # moving agent, for all actions at once
+        agents_, move_possible = self._moves(agent)
+        actions_ = np.flatnonzero(move_possible)
+        agents_ = agents_[move_possible]
+        n = len(actions_)
+        axes = tuple(range(-Ndim, 0))
+        cells = (np.arange(n),) + tuple(agents_.T)
+
+        # calculating p_end
+        p_end = p_source[cells[1:]]
+
+        # updating p_source for not finding source, shape (n, *shape): renormalized copies, then agent cell to 0
+        norm = np.sum(p_source) - p_end
+        inv = np.divide(1.0, norm, out=np.ones(n), where=norm > EPSILON)
+        p_source_ = p_source[np.newaxis] * inv[(...,) + (np.newaxis,) * Ndim]
+        p_source_[cells] = 0.0
+
+        # extracting the evidence matrices for Bayesian inference, shape (n, Nhits, *shape)
+        p_evidence = np.stack(
+            [p_Poisson[self._slices(agent_, p_Poisson.shape)] for agent_ in agents_]
+        )
+
+        # updating p_source_ by Bayesian inference, shape (n, Nhits, *shape)
+        p_source_ = p_source_[:, np.newaxis] * p_evidence
+        p_hit = np.sum(p_source_, axis=axes)
+        np.divide(p_source_, p_hit[(...,) + (np.newaxis,) * Ndim], out=p_source_,
+                  where=p_hit[(...,) + (np.newaxis,) * Ndim] > EPSILON)
+
+        # calculating entropy
+        entropy_ = - np.sum(xlogy(p_source_, p_source_), axis=axes) / np.log(2)
+        expected_S = (1.0 - p_end) * np.sum(p_hit * entropy_, axis=1)
+        # force the agent to go the source (essentially never used)
+        expected_S[p_end > 1 - EPSILON] = -EPSILON
+
+        delta_entropy = np.ones(Nactions) * float("inf")
+        delta_entropy[actions_] = expected_S - self.env.entropy
+
+        action_chosen = _argmin_choice(delta_entropy, scale=self.env.entropy)
 
         return action_chosen, -delta_entropy
 
     def _infotaxis_n_steps(self, steps_ahead, discount):
         """Infotaxis policy, n-steps ahead"""
 
-        # initialization of the info using the current position
-        p_source = [self.env.p_source]
-        entropy = [self.env.entropy]
-        backup = [0]
-        agent = [np.asarray(self.env.agent)]
-        p_end = [float("inf")]
-        p_hit = [float("inf")]
-        terminal = [0]
+        # initialization of the info using the current position, and of the matrices for each step
+        p_source, entropy, backup, p_hit, p_end, agent, terminal = self._init_n_steps_tree(
+            steps_ahead, entropy_init=1e16)  # large enough number
 
         # Filling the info for each step
         step = 0
         while True:
-            # creating the different matrices
-            p_source.append(
-                np.ones([self.env.Nactions, self.env.Nhits] * (step + 1) + list(self.env.shape))
-                / (np.prod(self.env.shape) - 1))
-            entropy.append(
-                np.ones([self.env.Nactions, self.env.Nhits] * (step + 1)) * 1e16)  # large enough number
-            backup.append(
-                np.zeros([self.env.Nactions, self.env.Nhits] * (step + 1), dtype='float'))
-            p_hit.append(np.ones([self.env.Nactions, self.env.Nhits] * (step + 1)))
-            p_end.append(np.zeros([self.env.Nactions, self.env.Nhits] * (step + 1)))
-            agent.append(
-                -np.ones([self.env.Nactions, self.env.Nhits] * (step + 1) + [self.env.Ndim], dtype=int))
-            terminal.append(np.zeros([self.env.Nactions, self.env.Nhits] * (step + 1), dtype='int'))
-
-            for index, _ in np.ndenumerate(entropy[step]):
-                if step > 0 and terminal[step][index] > 0:  # previous state was terminal: special handling
-                    for a in range(self.env.Nactions):
-                        for h in range(self.env.Nhits):
-                            terminal[step + 1][index + (a, h)] = terminal[step][index] + 1
-                            agent[step + 1][index + (a, h)] = agent[step][index].tolist()
-                            p_end[step + 1][index + (a, h)] = 0.0
-                            p_hit[step + 1][index + (a, h)] = 1.0 / self.env.Nhits
-                            p_source[step + 1][index + (a, h)] = np.nan
-                            entropy[step + 1][index + (a, h)] = 0.0
-                else:
-                    for a in range(self.env.Nactions):
-                        # moving agent
-                        agent_, move_possible = self.env._move(
-                            a, agent[step][index].tolist()
-                        )
-                        if move_possible and not np.all(agent[step][index] == -1):
-                            # calculating p_end
-                            p_source_ = deepcopy(p_source[step][index])
-                            p_end_ = p_source_[tuple(agent_)]
-
-                            if p_end_ > 1 - EPSILON:
-                                for h in range(self.env.Nhits):
-                                    terminal[step + 1][index + (a, h)] = 1
-
-                            # updating p_source for not finding source
-                            p_source_[tuple(agent_)] = 0
-                            if np.sum(p_source_) > EPSILON:
-                                p_source_ /= np.sum(p_source_)
-
-                            # extracting the evidence matrix for Bayesian inference
-                            p_evidence = self.env._extract_N_from_2N(input=self.env.p_Poisson, origin=agent_)
-
-                            # calculating the Bayesian inference
-                            p_source_ = p_source_ * p_evidence
-                            p_hit_ = np.sum(p_source_,
-                                            axis=tuple(range(1, p_source_.ndim)))
-
-                            # Filling the different matrices
-                            for h in range(self.env.Nhits):
-                                if p_hit_[h] > EPSILON:
-                                    p_source_[h] /= p_hit_[h]
-                                agent[step + 1][index + (a, h)] = agent_
-                                p_end[step + 1][index + (a, h)] = p_end_
-                                p_hit[step + 1][index + (a, h)] = p_hit_[h]
-                                p_source[step + 1][index + (a, h)] = p_source_[h]
-                                entropy[step + 1][index + (a, h)] = self.env._entropy(
-                                    p_source_[h]
-                                )
+            # expanding all the nodes of the current step at once
+            self._expand_n_steps_tree(step, p_source, entropy, p_hit, p_end, agent, terminal,
+                                      discounted=True)
 
             step += 1
             if step == steps_ahead:
@@ -256,9 +324,7 @@ class HeuristicPolicy(Policy):
                     )
                     cum_gain_reduced_over_obs = np.sum(cum_gain_to_reduce, axis=cum_gain_to_reduce.ndim - 1)
                     if s == 0:
-                        action_chosen = np.argwhere(np.abs(
-                            cum_gain_reduced_over_obs - np.max(cum_gain_reduced_over_obs)) < EPSILON_CHOICE).flatten()[
-                            0]
+                        action_chosen = _argmin_choice(-cum_gain_reduced_over_obs, rtol=REL_TOL_CHOICE_N_STEPS)
                     else:
                         backup[s] = entropy[s] + np.amax(cum_gain_reduced_over_obs,
                                                          axis=cum_gain_reduced_over_obs.ndim - 1)
@@ -269,78 +335,16 @@ class HeuristicPolicy(Policy):
     def _infotaxis_n_steps_no_discount(self, steps_ahead):
         """Infotaxis policy, n-steps ahead, without any discounting"""
 
-        # initialization of the info using the current position
-        p_source = [self.env.p_source]
-        entropy = [self.env.entropy]
-        agent = [np.asarray(self.env.agent)]
-        p_end = [float("inf")]
-        p_hit = [float("inf")]
-        terminal = [0]
+        # initialization of the info using the current position, and of the matrices for each step
+        p_source, entropy, _, p_hit, p_end, agent, terminal = self._init_n_steps_tree(
+            steps_ahead, entropy_init=float("inf"))
 
         # Filling the info for each step
         step = 0
         while True:
-            # creating the different matrices
-            p_source.append(
-                np.ones([self.env.Nactions, self.env.Nhits] * (step + 1) + list(self.env.shape))
-                / (np.prod(self.env.shape) - 1))
-            entropy.append(
-                np.ones([self.env.Nactions, self.env.Nhits] * (step + 1)) * float("inf"))
-            p_hit.append(np.ones([self.env.Nactions, self.env.Nhits] * (step + 1)))
-            p_end.append(np.zeros([self.env.Nactions, self.env.Nhits] * (step + 1)))
-            agent.append(
-                -np.ones([self.env.Nactions, self.env.Nhits] * (step + 1) + [self.env.Ndim], dtype=int))
-            terminal.append(np.zeros([self.env.Nactions, self.env.Nhits] * (step + 1), dtype='int'))
-
-            for index, _ in np.ndenumerate(entropy[step]):
-                if step > 0 and terminal[step][index] > 0:  # previous state was terminal: special handling
-                    for a in range(self.env.Nactions):
-                        for h in range(self.env.Nhits):
-                            terminal[step + 1][index + (a, h)] = terminal[step][index] + 1
-                            agent[step + 1][index + (a, h)] = agent[step][index].tolist()
-                            p_end[step + 1][index + (a, h)] = 0.0
-                            p_hit[step + 1][index + (a, h)] = 1.0 / self.env.Nhits
-                            p_source[step + 1][index + (a, h)] = np.nan
-                            entropy[step + 1][index + (a, h)] = - terminal[step][index]
-                else:
-                    for a in range(self.env.Nactions):
-                        # moving agent
-                        agent_, move_possible = self.env._move(
-                            a, agent[step][index].tolist()
-                        )
-                        if move_possible and not np.all(agent[step][index] == -1):
-                            # calculating p_end
-                            p_source_ = deepcopy(p_source[step][index])
-                            p_end_ = p_source_[tuple(agent_)]
-
-                            if p_end_ > 1 - EPSILON:
-                                for h in range(self.env.Nhits):
-                                    terminal[step + 1][index + (a, h)] = 1
-
-                            # updating p_source for not finding source
-                            p_source_[tuple(agent_)] = 0
-                            if np.sum(p_source_) > EPSILON:
-                                p_source_ /= np.sum(p_source_)
-
-                            # extracting the evidence matrix for Bayesian inference
-                            p_evidence = self.env._extract_N_from_2N(input=self.env.p_Poisson, origin=agent_)
-
-                            # calculating the Bayesian inference
-                            p_source_ = p_source_ * p_evidence
-                            p_hit_ = np.sum(p_source_,
-                                            axis=tuple(range(1, p_source_.ndim)))
-
-                            # Filling the different matrices
-                            for h in range(self.env.Nhits):
-                                if p_hit_[h] > EPSILON:
-                                    p_source_[h] /= p_hit_[h]
-                                agent[step + 1][index + (a, h)] = agent_
-                                p_end[step + 1][index + (a, h)] = p_end_
-                                p_hit[step + 1][index + (a, h)] = p_hit_[h]
-                                p_source[step + 1][index + (a, h)] = p_source_[h]
-                                entropy[step + 1][index + (a, h)] = self.env._entropy(
-                                    p_source_[h]
-                                )
+            # expanding all the nodes of the current step at once
+            self._expand_n_steps_tree(step, p_source, entropy, p_hit, p_end, agent, terminal,
+                                      discounted=False)
 
             step += 1
 
@@ -352,8 +356,7 @@ class HeuristicPolicy(Policy):
                     )
                     expected_S = np.sum(expected_S, axis=expected_S.ndim - 1)
                     if s == 0:
-                        action_chosen = np.argwhere(np.abs(expected_S - np.min(expected_S)) < EPSILON_CHOICE).flatten()[
-                            0]
+                        action_chosen = _argmin_choice(expected_S, rtol=REL_TOL_CHOICE_N_STEPS)
                     else:
                         entropy[s] = np.amin(expected_S, axis=expected_S.ndim - 1)
 
@@ -361,154 +364,284 @@ class HeuristicPolicy(Policy):
 
         return action_chosen, self.env.entropy - expected_S
 
+    def _init_n_steps_tree(self, steps_ahead, entropy_init):
+        """Return the lists of matrices used by the n-steps infotaxis, indexed by step (0 is the current state).
+
+        The matrices of steps > 0 have shape [Nactions, Nhits] * step (+ grid shape or [Ndim]), they are allocated
+        once and reset at each call. The lists are new objects, so that their items can be reassigned by the caller.
+        """
+        if getattr(self, "_tree_steps_ahead", None) != steps_ahead:
+            keys = ("p_source", "entropy", "backup", "p_hit", "p_end", "agent", "terminal")
+            self._tree = {key: [None] for key in keys}
+            for step in range(1, steps_ahead + 1):
+                size = [self.env.Nactions, self.env.Nhits] * step
+                self._tree["p_source"].append(np.empty(size + list(self.env.shape)))
+                self._tree["entropy"].append(np.empty(size))
+                self._tree["backup"].append(np.empty(size))
+                self._tree["p_hit"].append(np.empty(size))
+                self._tree["p_end"].append(np.empty(size))
+                self._tree["agent"].append(np.empty(size + [self.env.Ndim], dtype=int))
+                self._tree["terminal"].append(np.empty(size, dtype=int))
+            self._tree_steps_ahead = steps_ahead
+
+        for step in range(1, steps_ahead + 1):
+            self._tree["entropy"][step].fill(entropy_init)
+            self._tree["backup"][step].fill(0.0)
+            self._tree["p_hit"][step].fill(1.0)
+            self._tree["p_end"][step].fill(0.0)
+            self._tree["agent"][step].fill(-1)
+            self._tree["terminal"][step].fill(0)
+
+        p_source = [self.env.p_source] + self._tree["p_source"][1:]
+        entropy = [self.env.entropy] + self._tree["entropy"][1:]
+        backup = [0] + self._tree["backup"][1:]
+        p_hit = [float("inf")] + self._tree["p_hit"][1:]
+        p_end = [float("inf")] + self._tree["p_end"][1:]
+        agent = [np.asarray(self.env.agent)] + self._tree["agent"][1:]
+        terminal = [0] + self._tree["terminal"][1:]
+
+        return p_source, entropy, backup, p_hit, p_end, agent, terminal
+
+    def _expand_n_steps_tree(self, step, p_source, entropy, p_hit, p_end, agent, terminal, discounted):
+        """Fill the matrices of step + 1 from those of step, for all nodes, actions and hits at once.
+
+        Nodes of step are flattened to a batch of size B = (Nactions * Nhits) ** step,
+        and children of step + 1 are viewed with shape (B, Nactions, Nhits).
+        """
+        Nactions, Nhits, Ndim, shape = self.env.Nactions, self.env.Nhits, self.env.Ndim, tuple(self.env.shape)
+        p_Poisson = self.env.p_Poisson
+        B = (Nactions * Nhits) ** step
+        axes = tuple(range(-Ndim, 0))
+
+        p_source_s = np.reshape(p_source[step], (B,) + shape)
+        agent_s = np.reshape(agent[step], (B, Ndim))
+        terminal_s = np.reshape(terminal[step], (B,))
+
+        p_source_c = p_source[step + 1].reshape((B, Nactions, Nhits) + shape)
+        entropy_c = entropy[step + 1].reshape((B, Nactions, Nhits))
+        p_hit_c = p_hit[step + 1].reshape((B, Nactions, Nhits))
+        p_end_c = p_end[step + 1].reshape((B, Nactions, Nhits))
+        agent_c = agent[step + 1].reshape((B, Nactions, Nhits, Ndim))
+        terminal_c = terminal[step + 1].reshape((B, Nactions, Nhits))
+
+        # previous state was terminal: special handling
+        is_terminal = terminal_s > 0 if step > 0 else np.zeros(B, dtype=bool)
+        if np.any(is_terminal):
+            terminal_c[is_terminal] = terminal_s[is_terminal, np.newaxis, np.newaxis] + 1
+            agent_c[is_terminal] = agent_s[is_terminal, np.newaxis, np.newaxis, :]
+            p_end_c[is_terminal] = 0.0
+            p_hit_c[is_terminal] = 1.0 / Nhits
+            p_source_c[is_terminal] = np.nan
+            if discounted:
+                entropy_c[is_terminal] = 0.0
+            else:
+                entropy_c[is_terminal] = - terminal_s[is_terminal, np.newaxis, np.newaxis]
+
+        # moving agents, shape (B, Nactions, Ndim)
+        agent_ = agent_s[:, np.newaxis, :] + self._move_offsets[np.newaxis, :, :]
+        move_possible = np.all((agent_ >= 0) & (agent_ < self._grid_shape), axis=-1)
+        alive = ~np.all(agent_s == -1, axis=-1) & ~is_terminal
+        bi, ai = np.nonzero(move_possible & alive[:, np.newaxis])
+        if len(bi) == 0:
+            return
+        agent_ = agent_[bi, ai]  # (M, Ndim)
+        cells = (np.arange(len(bi)),) + tuple(agent_.T)
+
+        # calculating p_end
+        p_source_ = p_source_s[bi]  # (M, *shape), this is a copy
+        p_end_ = p_source_[cells]
+        terminal_c[bi[p_end_ > 1 - EPSILON], ai[p_end_ > 1 - EPSILON]] = 1
+
+        # updating p_source for not finding source
+        p_source_[cells] = 0.0
+        norm = np.sum(p_source_, axis=axes, keepdims=True)
+        np.divide(p_source_, norm, out=p_source_, where=norm > EPSILON)
+
+        # extracting the evidence matrices for Bayesian inference, shape (M, Nhits, *shape)
+        windows = np.lib.stride_tricks.sliding_window_view(p_Poisson, shape, axis=tuple(range(1, Ndim + 1)))
+        origin = (np.array(p_Poisson.shape[1:]) - 1) // 2 - agent_
+        p_evidence = np.moveaxis(windows[(slice(None),) + tuple(origin.T)], 0, 1)
+
+        # calculating the Bayesian inference
+        p_source_ = p_source_[:, np.newaxis] * p_evidence
+        p_hit_ = np.sum(p_source_, axis=axes)
+        np.divide(p_source_, p_hit_[(...,) + (np.newaxis,) * Ndim], out=p_source_,
+                  where=p_hit_[(...,) + (np.newaxis,) * Ndim] > EPSILON)
+
+        # Filling the different matrices
+        agent_c[bi, ai] = agent_[:, np.newaxis, :]
+        p_end_c[bi, ai] = p_end_[:, np.newaxis]
+        p_hit_c[bi, ai] = p_hit_
+        p_source_c[bi, ai] = p_source_
+        entropy_c[bi, ai] = - np.sum(xlogy(p_source_, p_source_), axis=axes) / np.log(2)
+
     def _init_space_aware_infotaxis(self, ):
-        shape = tuple([2 * n + 1 for n in self.env.shape])
-        origin = self.env.shape
-        self.distance_array = self.env._distance(shape=shape, origin=origin, norm="Manhattan")
+        shape = tuple([2 * n - 1 for n in self.env.shape])
+        origin = tuple([n - 1 for n in self.env.shape])
+        self.distance_array = self.env._distance(shape=shape, origin=origin, norm="Manhattan").astype(np.float32)
+        self._dist_views = {}
 
     def _space_aware_infotaxis(self, ):
         """Policy that minimizes an empirical proxi of the value function based on the entropy and the mean distance."""
+        Nactions, Ndim = self.env.Nactions, self.env.Ndim
+        p_source, p_Poisson, agent = self.env.p_source, self.env.p_Poisson, self.env.agent
 
         if not hasattr(self, 'distance_array'):
             # assumes Manhattan norm for distances, this can be changed in _init_space_aware_infotaxis()
             self._init_space_aware_infotaxis()
 
-        to_minimize = np.ones(self.env.Nactions) * float("inf")
-        for a in range(self.env.Nactions):
-            # moving agent
-            agent_, move_possible = self.env._move(a, self.env.agent)
-            if move_possible:
-                # array of Manhattan distances
-                dist = self.env._extract_N_from_2N(input=self.distance_array, origin=agent_)
-
-                # calculating p_end
-                p_source_ = deepcopy(self.env.p_source)
-                p_end = p_source_[tuple(agent_)]
-                if p_end > 1 - EPSILON:
-                    # force the agent to go the source (essentially never used)
-                    expected_value = - EPSILON
-                else:
-                    # updating p_source for not finding source
-                    p_source_[tuple(agent_)] = 0
-                    if np.sum(p_source_) > EPSILON:
-                        p_source_ /= np.sum(p_source_)
-
-                    # extracting the evidence matrix for Bayesian inference
-                    p_evidence = self.env._extract_N_from_2N(input=self.env.p_Poisson, origin=agent_)
-
-                    # updating p_source_ by Bayesian inference
-                    p_source_ = p_source_ * p_evidence
-                    p_hit = np.sum(p_source_, axis=tuple(range(1, p_source_.ndim)))
-                    for h in range(self.env.Nhits):
-                        if p_hit[h] > EPSILON:
-                            p_source_[h] /= p_hit[h]
-
-                    # estimating expected time
-                    expected_value = 0.0
-                    for h in range(self.env.Nhits):
-                        D = np.sum(p_source_[h] * dist)
-                        H = self.env._entropy(p_source_[h])
-                        value = D + 2 ** (H - 1) - 1 / 2
-                        if value > 0.0:
-                            value = np.log2(value)
-                        expected_value += (1.0 - p_end) * p_hit[h] * value
-
-                to_minimize[a] = expected_value
-
-        # action_chosen = np.argwhere(np.abs(to_minimize - np.min(to_minimize)) < EPSILON_CHOICE).flatten()[0]
-        action_chosen = np.argmin(to_minimize)
+        if self._use_numba:
+            to_minimize, move_possible = space_aware_kernel(
+                p_source, p_Poisson, self.distance_array, np.asarray(agent),
+                self._move_offsets
+            )
+            to_minimize = np.where(move_possible, to_minimize, float("inf"))
+            action_chosen = _argmin_choice(to_minimize)
+            return action_chosen, to_minimize
+
+        # moving agent, for all actions at once
+        agents_, move_possible = self._moves(agent)
+
+        total = np.sum(p_source)
+        to_minimize = np.ones(Nactions) * float("inf")
+        for a in np.flatnonzero(move_possible):
+            agent_ = tuple(agents_[a])
+            # array of Manhattan distances
+            dist = self._dist_view(agent_)
+
+            # calculating p_end, and updating p_source for not finding source (renormalized copy, then agent cell to 0)
+            p_end = p_source[agent_]
+            norm = total - p_end
+            p_source_ = self._p_scratch
+            np.multiply(p_source, 1.0 / norm if norm > EPSILON else 1.0, out=p_source_)
+            p_source_[agent_] = 0.0
+
+            # extracting the evidence matrix for Bayesian inference
+            p_evidence = p_Poisson[self._slices(agent_, p_Poisson.shape)]
+
+            # updating p_source_ by Bayesian inference
+            p_source_ = p_source_ * p_evidence
+            axes = tuple(range(1, p_source_.ndim))
+            p_hit = np.sum(p_source_, axis=axes)
+            p_hit_ = p_hit[(...,) + (np.newaxis,) * Ndim]
+            np.divide(p_source_, p_hit_, out=p_source_, where=p_hit_ > EPSILON)
+
+            # estimating expected time, for all hits at once
+            D = np.sum(p_source_ * dist, axis=axes)
+            H = - np.sum(xlogy(p_source_, p_source_), axis=axes) / np.log(2)
+            value = D + 2 ** (H - 1) - 1 / 2
+            np.log2(value, out=value, where=value > 0.0)
+            expected_value = (1.0 - p_end) * np.sum(p_hit * value)
+
+            if p_end > 1 - EPSILON:
+                # force the agent to go the source (essentially never used)
+                expected_value = - EPSILON
+            to_minimize[a] = expected_value
+
+        action_chosen = _argmin_choice(to_minimize)
 
         return action_chosen, to_minimize
 
     def _greedy_policy(self):
         """Usual greedy policy"""
-        p = np.ones(self.env.Nactions) * float("inf")
-        for a in range(self.env.Nactions):
-            agent_, move_possible = self.env._move(a, self.env.agent)
-            if move_possible:
-                p[a] = 1.0 - self.env.p_source[tuple(agent_)]
-        # action_chosen = np.argwhere(np.abs(p - np.min(p)) < EPSILON_CHOICE).flatten()[0]
-        action_chosen = np.argmin(p)
+        Nactions, p_source, agent = self.env.Nactions, self.env.p_source, self.env.agent
+        agents_, move_possible = self._moves(agent)
+        p = np.ones(Nactions) * float("inf")
+        p[move_possible] = 1.0 - p_source[tuple(agents_[move_possible].T)]
+        # rounding errors are relative to p_source, not to 1 - p_source
+        action_chosen = _argmin_choice(p, scale=np.max(1.0 - p[move_possible]))
         return action_chosen, p
 
     def _init_mean_distance_policy(self, ):
-        shape = tuple([2 * n + 1 for n in self.env.shape])
-        origin = self.env.shape
-        self.distance_array = self.env._distance(shape, origin=origin, norm="Manhattan")
+        shape = tuple([2 * n - 1 for n in self.env.shape])
+        origin = tuple([n - 1 for n in self.env.shape])
+        self.distance_array = self.env._distance(shape, origin=origin, norm="Manhattan").astype(np.float32)
+        self._dist_views = {}
 
     def _mean_distance_policy(self, ):
         """Policy that chooses the action that minimizes the expected distance to the source at the next step"""
+        Nactions, Ndim = self.env.Nactions, self.env.Ndim
+        p_source, p_Poisson, agent = self.env.p_source, self.env.p_Poisson, self.env.agent
 
         if not hasattr(self, 'distance_array'):
             self._init_mean_distance_policy()
 
-        to_minimize = np.ones(self.env.Nactions) * float("inf")
-        for a in range(self.env.Nactions):
-            # moving agent
-            agent_, move_possible = self.env._move(a, self.env.agent)
-            if move_possible:
-                # calculating p_end
-                p_source_ = deepcopy(self.env.p_source)
-                p_end = p_source_[tuple(agent_)]
-                if p_end > 1 - EPSILON:
-                    # force the agent to go the source (essentially never used)
-                    to_minimize[a] = -EPSILON
-                else:
-                    # updating p_source for not finding source
-                    p_source_[tuple(agent_)] = 0
-                    if np.sum(p_source_) > EPSILON:
-                        p_source_ /= np.sum(p_source_)
-
-                    # extracting the evidence matrix for Bayesian inference
-                    p_evidence = self.env._extract_N_from_2N(input=self.env.p_Poisson, origin=agent_)
-
-                    # updating p_source_ by Bayesian inference
-                    p_source_ = p_source_ * p_evidence
-                    p_hit = np.sum(p_source_, axis=tuple(range(1, p_source_.ndim)))
-                    for h in range(self.env.Nhits):
-                        if p_hit[h] > EPSILON:
-                            p_source_[h] /= p_hit[h]
-
-                    # calculating the distance term
-                    D = self.env._extract_N_from_2N(input=self.distance_array, origin=agent_)
-                    D = np.sum(p_source_ * D, axis=tuple(range(1, p_source_.ndim)))
-
-                    # minimize a linear combination of the two
-                    to_minimize[a] = (1.0 - p_end) * np.sum(p_hit * D)
-
-        # action_chosen = np.argwhere(np.abs(to_minimize - np.min(to_minimize)) < EPSILON_CHOICE).flatten()[0]
-        action_chosen = np.argmin(to_minimize)
+        if self._use_numba:
+            to_minimize, move_possible = mean_distance_kernel(
+                p_source, p_Poisson, self.distance_array, np.asarray(agent),
+                self._move_offsets
+            )
+            to_minimize = np.where(move_possible, to_minimize, float("inf"))
+            action_chosen = _argmin_choice(to_minimize)
+            return action_chosen, to_minimize
+
+        # moving agent, for all actions at once
+        agents_, move_possible = self._moves(agent)
+
+        total = np.sum(p_source)
+        to_minimize = np.ones(Nactions) * float("inf")
+        for a in np.flatnonzero(move_possible):
+            agent_ = tuple(agents_[a])
+            # calculating p_end, and updating p_source for not finding source (renormalized copy, then agent cell to 0)
+            p_end = p_source[agent_]
+            norm = total - p_end
+            p_source_ = self._p_scratch
+            np.multiply(p_source, 1.0 / norm if norm > EPSILON else 1.0, out=p_source_)
+            p_source_[agent_] = 0.0
+
+            # extracting the evidence matrix for Bayesian inference
+            p_evidence = p_Poisson[self._slices(agent_, p_Poisson.shape)]
+
+            # updating p_source_ by Bayesian inference
+            p_source_ = p_source_ * p_evidence
+            p_hit = np.sum(p_source_, axis=tuple(range(1, p_source_.ndim)))
+            p_hit_ = p_hit[(...,) + (np.newaxis,) * Ndim]
+            np.divide(p_source_, p_hit_, out=p_source_, where=p_hit_ > EPSILON)
+
+            # calculating the distance term
+            D = self._dist_view(agent_)
+            D = np.sum(p_source_ * D, axis=tuple(range(1, p_source_.ndim)))
+
+            # minimize a linear combination of the two
+            to_minimize[a] = (1.0 - p_end) * np.sum(p_hit * D)
+
+            if p_end > 1 - EPSILON:
+                # force the agent to go the source (essentially never used)
+                to_minimize[a] = -EPSILON
+
+        action_chosen = _argmin_choice(to_minimize)
 
         return action_chosen, to_minimize
 
     def _init_p_over_d_policy(self, ):
-        shape = tuple([2 * n + 1 for n in self.env.shape])
-        origin = self.env.shape
-        self.distance_array = self.env._distance(shape, origin=origin, norm="Manhattan")
+        shape = tuple([2 * n - 1 for n in self.env.shape])
+        origin = tuple([n - 1 for n in self.env.shape])
+        self.distance_array = self.env._distance(shape, origin=origin, norm="Manhattan").astype(np.float32)
+        self._dist_views = {}
 
     def _p_over_d_policy(self, ):
         """A simple yet effective reactive policy developed by Manuel Maeritz and Luka Negrojevic."""
+        Nactions, p_source, agent = self.env.Nactions, self.env.p_source, self.env.agent
         if not hasattr(self, 'distance_array'):
             self._init_p_over_d_policy()
 
-        to_minimize = np.ones(self.env.Nactions)*float('inf')
-        p_found = np.zeros(self.env.Nactions)
+        to_minimize = np.ones(Nactions)*float('inf')
+        p_found = np.zeros(Nactions)
 
         # distance array
-        d = self.env._extract_N_from_2N(input=self.distance_array, origin=self.env.agent)
+        d = self._dist_view(agent)
         d[d == 0] = np.inf
 
         # most likely source location, replacing p by p/d
-        most_likely_source = np.unravel_index(np.argmax(self.env.p_source/d, axis=None), self.env.p_source.shape)
-
-        for a in range(self.env.Nactions):
-            # moving agent
-            agent_, move_possible = self.env._move(a, self.env.agent)
-            if move_possible:
-                # Manhattan distance between agent and source
-                to_minimize[a] = np.linalg.norm(np.asarray(agent_) - np.asarray(most_likely_source), ord=1)
-                # prob to found the source upon moving
-                p_found[a] = self.env.p_source[tuple(agent_)]
+        most_likely_source = np.unravel_index(np.argmax(p_source/d, axis=None), p_source.shape)
+
+        # moving agent, for all actions at once
+        agents_, move_possible = self._moves(agent)
+        agents_ = agents_[move_possible]
+        # Manhattan distance between agent and source
+        to_minimize[move_possible] = np.sum(np.abs(agents_ - np.asarray(most_likely_source)), axis=1)
+        # prob to found the source upon moving
+        p_found[move_possible] = p_source[tuple(agents_.T)]
         best_actions = np.argwhere(np.abs(to_minimize - np.min(to_minimize)) < EPSILON_CHOICE).flatten()
         if len(best_actions) > 1:
             best_p_found = -EPSILON
@@ -4,7 +4,6 @@
 
 import os
 import numpy as np
-from copy import deepcopy
 import tensorflow as tf
 from .policy import Policy, policy_name
 
@@ -91,8 +90,7 @@ class RLPolicy(Policy):
             p_evidence = self.env._extract_N_from_2N(input=self.env.p_Poisson, origin=agent_)
 
             # updating p_source by Bayesian inference
-            p_source_ = deepcopy(self.env.p_source)
-            p_source_ = p_source_[np.newaxis, :] * p_evidence
+            p_source_ = self.env.p_source[np.newaxis, :] * p_evidence
 
             for h in range(self.env.Nhits):
                 prob = np.sum(p_source_[h])  # norm is the proba to transit to this state = (1-pend) * p(hit)
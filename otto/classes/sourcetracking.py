@@ -2,16 +2,20 @@
 # -*- coding: utf-8 -*-
 """Provides the SourceTracking class, to simulate the source-tracking POMDP."""
 
+import math
 import numpy as np
 import warnings
-from copy import deepcopy
+import functools
 from scipy.special import kv
 from scipy.special import kn
 from scipy.special import gamma as Gamma
-from scipy.stats import poisson as Poisson_distribution
+from scipy.special import gammaln, xlogy
+from ._st_numba import NUMBA_AVAILABLE, draw_poisson_hit, fused_update
 
 # _____________________  parameters  _____________________
 EPSILON = 1e-10
+DTYPE = np.float32  # dtype of the probability grids (p_Poisson and p_source)
+EPSILON_SUM = 1e-5  # tolerance on sums of probabilities stored in DTYPE
 DEBUG = False
 # ________________________________________________________
 
@@ -30,6 +34,8 @@ class SourceTracking:
             whether to actually draw the source location (otherwise uses Bayesian framework) (default=False)
         dummy (bool, optional):
                 set automatic parameters but does not initialize the POMDP (default=False)
+        seed (int or list of int, optional):
+            seed of the random generator of the first episode, fresh entropy if None (default=None)
 
     Attributes:
         R_bar (float):
@@ -54,7 +60,7 @@ class SourceTracking:
             number of possible actions
         NN_input_shape (tuple(int)):
             shape of the input array for neural network models
-        agent (list(int)):
+        agent (tuple(int)):
             current agent location
         p_source (ndarray):
             current probability distribution of the source location)
@@ -73,6 +79,9 @@ class SourceTracking:
 
     """
 
+    # p_Poisson shared (read-only) between all environments with the same class and parameters
+    _p_Poisson_cache = {}
+
     def __init__(
         self,
         R_bar=2.5,
@@ -80,6 +89,7 @@ class SourceTracking:
         tau_bar=150,
         draw_source=False,
         dummy=False,
+        seed=None,
     ):
         self.shape = (81, 41)
         if DEBUG:
@@ -100,6 +110,9 @@ class SourceTracking:
         # if stand_still:
         #     self.Nactions += 1
 
+        # (axis, direction) of each move action
+        self._action_table = tuple((action // 2, 2 * (action % 2) - 1) for action in range(2 * self.Ndim))
+
         self.draw_source = draw_source
 
         self.NN_input_shape = tuple([2 * n - 1 for n in self.shape])
@@ -114,22 +127,29 @@ class SourceTracking:
         self.obs = None
         self._agento, self._agentoo = None, None
         self._repeated_visits = None
+        self._rng = None
 
         if not dummy:
-            self.restart()
+            self.restart(seed=seed)
 
-    def restart(self):
+    def restart(self, seed=None):
         """Restart the search.
+
+        Args:
+            seed (int or list of int, optional): seed of the random generator, fresh entropy if None (default=None)
         """
+        # random generator of the episode (envs are often deep-copied before restarting, hence fresh entropy by default)
+        self._rng = np.random.default_rng(seed)
+
         self.initial_hit = 1
         if self.initial_hit > self.Nhits - 1:
             raise Exception("initial_hit cannot be > Nhits - 1")
 
         self.hit_map = -np.ones(self.shape, dtype=int)
         if self.Ndim == 2:
-            self.agent = [65, 20]
+            self.agent = (65, 20)
             if DEBUG:
-                self.agent = [15, 5]
+                self.agent = (15, 5)
         else:
             raise Exception("Only 2D is implemented")
         self._init_distributed_source()
@@ -141,8 +161,8 @@ class SourceTracking:
         self.agent_stuck = False
         self.obs = {"hit": 1, "done": False}
 
-        self._agento = [1] * self.Ndim  # position 1 step ago (arbitrary init value)
-        self._agentoo = [2] * self.Ndim  # position 2 steps ago (arbitrary init value)
+        self._agento = (1,) * self.Ndim  # position 1 step ago (arbitrary init value)
+        self._agentoo = (2,) * self.Ndim  # position 2 steps ago (arbitrary init value)
         self._repeated_visits = 0  # to detect back and forth motion
 
     def step(self, action, hit=None, quiet=False):
@@ -183,33 +203,26 @@ class SourceTracking:
         self.agent_stuck = self._is_agent_stuck()
 
         if self.draw_source:
+            # distance to the source, computed with scalar arithmetic
+            delta = [int(a) - int(s) for a, s in zip(self.agent, self.source)]
             if self.norm_Poisson == 'Manhattan':
-                ord = 1
+                d = float(sum(abs(v) for v in delta))
             elif self.norm_Poisson == 'Euclidean':
-                ord = 2
+                d = math.sqrt(sum(v * v for v in delta))
             elif self.norm_Poisson == 'Chebyshev':
-                ord = float("inf")
+                d = float(max(abs(v) for v in delta))
             else:
                 raise Exception("This norm is not implemented")
-            d = np.linalg.norm(np.asarray(self.agent) - np.asarray(self.source), ord=ord)
-            x = self.agent[0] - self.source[0]
+            x = delta[0]
 
             if d > EPSILON:
                 done = False
                 p_end = 0
 
-                # Picking randomly the number of hits
-                mu = self._mean_number_of_hits(d, x)
-                probability = np.zeros(self.Nhits)
-                sum_proba = 0
-                for h in range(self.Nhits - 1):
-                    probability[h] = self._Poisson(mu, h)
-                    sum_proba += self._Poisson(mu, h)
-                probability[self.Nhits - 1] = np.maximum(0, 1.0 - sum_proba)
+                # Picking randomly the number of hits (inversion of the Poisson CDF)
                 if hit is None:
-                    hit = np.random.RandomState().choice(
-                        range(self.Nhits), p=probability
-                    )
+                    mu = self._mean_number_of_hits(d, x)
+                    hit = draw_poisson_hit(mu, self._rng.random(), self.Nhits)
             else:
                 done = True
                 p_end = 1
@@ -218,39 +231,35 @@ class SourceTracking:
         else:
             done = False
 
-            p_end = self.p_source[tuple(self.agent)]
+            p_end = float(self.p_source[self.agent])
             if p_end > 1 - EPSILON:
                 done = True
 
             # Source not in self.agent
-            new_p_source = deepcopy(self.p_source)
-            new_p_source[tuple(self.agent)] = 0.0
-            if np.sum(new_p_source) > EPSILON:
-                new_p_source /= np.sum(new_p_source)
+            new_p_source = self.p_source.copy()
+            new_p_source[self.agent] = 0.0
+            norm = np.sum(new_p_source)
+            if norm > EPSILON:
+                new_p_source *= 1.0 / norm
             else:
                 done = True
 
             if not done:
                 # extracting the evidence matrix for Bayesian inference
-                p_evidence = self._extract_N_from_2N(input=self.p_Poisson, origin=self.agent)
-
-                # Compute hit proba
-                p_hit_table = np.zeros(self.Nhits)
-                for h in range(self.Nhits):
-                    p_hit_table[h] = np.maximum(
-                        0,
-                        np.sum(new_p_source * p_evidence[h])
-                    )
+                p_evidence = self._p_evidence(self.agent)
+
+                # Compute hit proba, for all hits at once
+                p_hit_table = np.maximum(0.0, np.tensordot(p_evidence, new_p_source, axes=self.Ndim))
                 sum_p_hit = np.sum(p_hit_table)
-                if np.abs(sum_p_hit - 1.0) < EPSILON:
-                    p_hit_table /= sum_p_hit
+                if np.abs(sum_p_hit - 1.0) < EPSILON_SUM:
+                    p_hit_table *= 1.0 / sum_p_hit
                 else:
                     print("sum_p_hit_table = ", sum_p_hit)
                     raise Exception("p_hit_table does not sum to 1")
 
                 # Picking randomly the number of hits
                 if hit is None:
-                    hit = np.random.RandomState().choice(range(self.Nhits), p=p_hit_table)
+                    hit = self._draw_hit(p_hit_table)
 
             else:
                 hit = -2
@@ -260,6 +269,11 @@ class SourceTracking:
 
         return hit, p_end, done
     
+    def _draw_hit(self, probability):
+        # inverse transform sampling from a single uniform number
+        u = self._rng.random()
+        return min(int(np.sum(np.cumsum(probability) <= u)), self.Nhits - 1)
+
     def _update_after_hit(self, hit, done=None):
         """Update of the hit_map and p_source when receiving hits.
 
@@ -273,7 +287,7 @@ class SourceTracking:
             self._update_p_source(hit, done)
             
     def _update_hit_map(self, hit=0):
-        self.hit_map[tuple(self.agent)] = hit
+        self.hit_map[self.agent] = hit
 
     def _update_obs(self, hit, done):
         self.obs["hit"] = hit
@@ -281,48 +295,45 @@ class SourceTracking:
 
     def _update_p_source(self, hit=0, done=None):
         if done:
-            self.p_source = np.zeros(self.shape)
-            self.p_source[tuple(self.agent)] = 1.0
+            self.p_source = np.zeros(self.shape, dtype=DTYPE)
+            self.p_source[self.agent] = 1.0
             self.entropy = 0.0
+        elif NUMBA_AVAILABLE and self.Ndim == 2:
+            # single fused pass (+ normalization) with numba
+            p_evidence = self._p_evidence(self.agent, hit)
+            self.entropy = fused_update(self.p_source, p_evidence, self.agent[0], self.agent[1])
         else:
-            self.p_source[tuple(self.agent)] = 0
-            p_evidence = self._extract_N_from_2N(input=self.p_Poisson, origin=self.agent)
-            self.p_source *= p_evidence[hit]
+            self.p_source[self.agent] = 0
+            p_evidence = self._p_evidence(self.agent, hit)
+            self.p_source *= p_evidence
             self.p_source[(self.p_source < 0.0) & (self.p_source > -1e-15)] = 0.0
 
-            if np.sum(self.p_source) > EPSILON:
-                self.p_source /= np.sum(self.p_source)
-            self.entropy = self._entropy(self.p_source)
+            norm = np.sum(self.p_source)
+            if norm > EPSILON:
+                self.p_source *= 1.0 / norm
+            self.entropy = float(self._entropy(self.p_source))
 
     def _move(self, action, agent):
         """Move the agent according to action.
 
         Args:
             action (int): action chosen
-            agent (list of int): position of the agent
+            agent (tuple of int): position of the agent
 
         Returns:
-            new_agent (list of int): new position of the agent
+            new_agent (tuple of int): new position of the agent
             is_move_possible (bool): whether the action was allowed
 
         """
-        is_move_possible = True
-        new_agent = deepcopy(agent)
-        axis = action // 2
-        if axis < self.Ndim:
-            direction = 2 * (action % 2) - 1
-            if direction == -1:
-                if agent[axis] > 0:
-                    new_agent[axis] -= 1
-                else:
-                    is_move_possible = False
-            elif direction == 1:
-                if agent[axis] < self.shape[axis] - 1:
-                    new_agent[axis] += 1
-                else:
-                    is_move_possible = False
+        new_agent = tuple(agent)
+        if 0 <= action < 2 * self.Ndim:
+            axis, direction = self._action_table[action]
+            new_position = new_agent[axis] + direction
+            is_move_possible = 0 <= new_position < self.shape[axis]
+            if is_move_possible:
+                new_agent = new_agent[:axis] + (new_position,) + new_agent[axis + 1:]
         elif action == 2 * self.Ndim:
-            pass  # do not move
+            is_move_possible = True  # do not move
         else:
             raise Exception("This action is outside the allowed range")
 
@@ -331,6 +342,10 @@ class SourceTracking:
     # __ HIT DETECTION _______________________________________
     def _mean_number_of_hits(self, distance, x_position):
         # x_position = x_agent - x_source
+        if np.ndim(distance) == 0 and np.ndim(x_position) == 0 and self.Ndim == 2:
+            # scalar path (hit sampling at each step)
+            distance = float(distance) if distance != 0 else 1.0
+            return self.R_bar / distance * math.exp(0.5 * self.V_bar * x_position - distance / self.lambda_bar)
         distance = np.array(distance)
         distance[distance == 0] = 1.0
         x_position = np.array(x_position)
@@ -340,86 +355,91 @@ class SourceTracking:
             raise Exception("Problem with the number of dimensions")
         return mu
 
-    def _Poisson_unbounded(self, mu, h):
-        p = Poisson_distribution(mu).pmf(h)
-        return p
+    def _Poisson(self, mu):
+        """Probability of each number of hits, for all hit values at once.
 
-    def _Poisson(self, mu, h):
-        if h < self.Nhits - 1:   # = Poisson(mu,hit=h)
-            p = self._Poisson_unbounded(mu, h)
-        elif h == self.Nhits - 1:     # = Poisson(mu,hit>=h)
-            sum = 0.0
-            for k in range(h):
-                sum += self._Poisson_unbounded(mu, k)
-            p = 1 - sum
-        else:
-            raise Exception("h cannot be > Nhits - 1")
+        Args:
+            mu (float or ndarray): mean number of hits
+
+        Returns:
+            p (ndarray): p[h] = Poisson(mu, hit=h) for h < Nhits - 1 and p[Nhits - 1] = Poisson(mu, hit>=Nhits - 1),
+                with shape (Nhits, *mu.shape)
+        """
+        mu = np.asarray(mu, dtype=float)
+        h = np.arange(self.Nhits - 1).reshape((-1,) + (1,) * mu.ndim)
+        p = np.empty((self.Nhits,) + mu.shape)
+        p[:-1] = np.exp(xlogy(h, mu) - mu - gammaln(h + 1))  # closed form exp(-mu) mu^h / h!
+        p[-1] = 1.0 - np.sum(p[:-1], axis=0)
         return p
-    
+
     def _compute_p_Poisson(self):
-        shape = [1 + 2 * n for n in self.shape]  # note: this could be reduced to size 2N - 1
-        origin = list(self.shape)
+        shape = [2 * n - 1 for n in self.shape]
+        origin = [n - 1 for n in self.shape]
         d = self._distance(shape=shape, origin=origin, norm=self.norm_Poisson)
         x = self._x_position(shape=shape, origin=origin)
         mu = self._mean_number_of_hits(d, x)
         mu[tuple(origin)] = 0.0
 
-        self.p_Poisson = np.zeros([self.Nhits] + list(shape))
-        sum_proba = np.zeros(shape)
-        for h in range(self.Nhits):
-            self.p_Poisson[h] = self._Poisson(mu, h)
-            sum_proba += self.p_Poisson[h]
-            if h < self.Nhits - 1:
-                sum_is_one = np.all(abs(sum_proba - 1) < EPSILON)
-                if sum_is_one:
-                    raise Exception(str('Nhits is too large, reduce it to Nhits = ' + str(h + 1)
-                                        + ' or lower (higher values have zero probabilities)'))
-
-        if not np.all(sum_proba == 1.0):
+        self.p_Poisson = self._Poisson(mu)
+        cumulative = np.cumsum(self.p_Poisson[:-1], axis=0)
+        sum_is_one = np.all(np.abs(cumulative - 1) < EPSILON, axis=tuple(range(1, mu.ndim + 1)))
+        if np.any(sum_is_one):
+            h = np.argmax(sum_is_one)
+            raise Exception(str('Nhits is too large, reduce it to Nhits = ' + str(h + 1)
+                                + ' or lower (higher values have zero probabilities)'))
+
+        if not np.all(np.sum(self.p_Poisson, axis=0) == 1.0):
             raise Exception("_compute_p_Poisson: sum proba is not 1")
 
         # by definition: p_Poisson(origin) = 0
-        for h in range(self.Nhits):
-            self.p_Poisson[tuple([h] + origin)] = 0.0
+        self.p_Poisson[(slice(None),) + tuple(origin)] = 0.0
+        self.p_Poisson = self.p_Poisson.astype(DTYPE)
 
     # __ INITIALIZATION AND AUTOSET _______________________________________
     def _draw_a_source(self):
-        prob = self.p_source.flatten()
-        index = np.random.RandomState().choice(np.prod(self.shape), size=1, p=prob)[0]
+        prob = self.p_source.ravel()
+        index = self._rng.choice(prob.size, p=prob)
         self.source = list(np.unravel_index(index, shape=self.shape))
 
     def _init_distributed_source(self, ):
         if not hasattr(self, 'p_Poisson'):
-            self._compute_p_Poisson()
-        self.p_source = np.ones(self.shape) / (np.prod(self.shape) - 1)
-        self.p_source[tuple(self.agent)] = 0.0
+            key = (type(self), self.R_bar, self.V_bar, self.tau_bar, tuple(self.shape), self.norm_Poisson, self.Nhits)
+            if key not in SourceTracking._p_Poisson_cache:
+                self._compute_p_Poisson()
+                self.p_Poisson.setflags(write=False)
+                SourceTracking._p_Poisson_cache[key] = self.p_Poisson
+            self.p_Poisson = SourceTracking._p_Poisson_cache[key]
+        self.p_source = np.full(self.shape, 1.0 / (math.prod(self.shape) - 1), dtype=DTYPE)
+        self.p_source[self.agent] = 0.0
         self._update_p_source(hit=self.initial_hit)
         self._update_hit_map(hit=self.initial_hit)
 
     # __ LOW LEVEL UTILITIES _______________________________________
     def _entropy(self, array, axes=None):
-        log2 = np.zeros(array.shape)
-        indices = array > EPSILON
-        log2[indices] = -np.log2(array[indices])
-        return np.sum(array * log2, axis=axes)
+        # xlogy(p, p) = p log(p), with 0 log(0) = 0
+        return - np.sum(xlogy(array, array), axis=axes) / np.log(2)
 
-    def _distance(self, shape, origin, norm='Euclidean'):
+    @staticmethod
+    def _distance(shape, origin, norm='Euclidean'):
         Ndim = len(shape)
-        coord = np.mgrid[tuple([range(n) for n in shape])]
-        for i in range(Ndim):
-            coord[i] -= origin[i]
-        d = np.zeros(shape)
+        # coordinates relative to origin along each axis, as 1D arrays broadcastable to shape
+        coord = [
+            np.reshape(np.arange(n) - o, [-1 if axis == i else 1 for axis in range(Ndim)])
+            for i, (n, o) in enumerate(zip(shape, origin))
+        ]
         if norm == 'Manhattan':
-            for i in range(Ndim):
-                d += np.abs(coord[i])
+            d = np.zeros(shape)
+            for c in coord:
+                d += np.abs(c)
             return d
         elif norm == 'Euclidean':
-            for i in range(Ndim):
-                d += (coord[i]) ** 2
+            d = np.zeros(shape)
+            for c in coord:
+                d += c ** 2
             d = np.sqrt(d)
             return d
         elif norm == 'Chebyshev':
-            d = np.amax(np.abs(coord), axis=0)
+            d = functools.reduce(np.maximum, [np.abs(c) for c in coord])
             return d
         else:
             raise Exception("This norm is not implemented")
@@ -449,18 +469,21 @@ class SourceTracking:
         #     agent_stuck = True
         # return agent_stuck
 
+    def _p_evidence(self, agent, hit=Ellipsis):
+        """Window of p_Poisson (for all hits, or for one hit) centered on agent: specialized _extract_N_from_2N."""
+        c0 = (self.p_Poisson.shape[1] - 1) // 2 - agent[0]
+        c1 = (self.p_Poisson.shape[2] - 1) // 2 - agent[1]
+        return self.p_Poisson[hit, c0:c0 + self.shape[0], c1:c1 + self.shape[1]]
+
     def _extract_N_from_2N(self, input, origin):
         if len(origin) != self.Ndim:
             raise Exception("_extract_N_from_2N: len(origin) is different from Ndim")
         off = len(input.shape) - len(self.shape)
         if off < 0:
             raise Exception("bug, should not happen")
-        if np.all([input.shape[off + axis] == 2 * self.shape[axis] + 1 for axis in range(self.Ndim)]):
-            index = np.array(self.shape) - origin
-        elif np.all([input.shape[off + axis] == 2 * self.shape[axis] - 1 for axis in range(self.Ndim)]):
-            index = np.array([n - 1 for n in self.shape]) - origin
-        else:
-            raise Exception("_extract_N_from_2N(): dimension of input must be 2N-1 or 2N+1")
+        if not np.all([input.shape[off + axis] == 2 * self.shape[axis] - 1 for axis in range(self.Ndim)]):
+            raise Exception("_extract_N_from_2N(): dimension of input must be 2N-1")
+        index = np.array([n - 1 for n in self.shape]) - origin
         if self.Ndim == 1:
             output = input[..., index[0]:index[0] + self.shape[0]]
         elif self.Ndim == 2:
@@ -519,11 +542,11 @@ class SourceTracking:
         else:
             # WARNING: must be zero for the terminal state
             if not hasattr(self, 'Manhattan_array'):
-                shape = tuple([2 * n + 1 for n in self.shape])
-                self.Manhattan_array = self._distance(shape=shape, origin=self.shape, norm="Manhattan")
+                # shared (read-only) between all environments with the same grid
+                self.Manhattan_array = _cached_Manhattan_array(tuple(self.shape))
 
             dist = self._extract_N_from_2N(input=self.Manhattan_array, origin=agent)
-            D = np.sum(p_source * dist)
+            D = np.tensordot(p_source, dist, axes=self.Ndim)[()]
 
             if which == "D":
                 return D
@@ -532,3 +555,11 @@ class SourceTracking:
                 raise Exception("This reward shaping function is not implemented")
 
 
+@functools.lru_cache(maxsize=8)
+def _cached_Manhattan_array(shape):
+    """Return the (read-only) array of Manhattan distances to the center of a grid of size 2N-1, computed once."""
+    Manhattan_array = SourceTracking._distance(
+        shape=tuple([2 * n - 1 for n in shape]), origin=tuple([n - 1 for n in shape]), norm="Manhattan"
+    )
+    Manhattan_array.setflags(write=False)
+    return Manhattan_array
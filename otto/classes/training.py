@@ -3,7 +3,6 @@
 """Functions and classes required to train a value model on the source-tracking POMDP."""
 import os
 import numpy as np
-from copy import deepcopy
 import tensorflow as tf
 from tensorflow.keras import layers
 from tensorflow.keras import Model
@@ -22,7 +21,7 @@ class State:
     Attributes:
         p_source (ndarray):
             probability distribution of the source
-        agent (list(int)):
+        agent (tuple(int)):
             location of the agent
         prob (float):
             - if current state s, then prob=1.0;
@@ -115,8 +114,7 @@ class TrainingEnv(SourceTracking):
             p_evidence = self._extract_N_from_2N(input=self.p_Poisson, origin=agent_)
 
             # updating p_source by Bayesian inference
-            p_source_ = deepcopy(self.p_source)
-            p_source_ = p_source_[np.newaxis, :] * p_evidence
+            p_source_ = self.p_source[np.newaxis, :] * p_evidence
 
             for h in range(self.Nhits):
                 prob = np.sum(p_source_[h])  # norm is the proba to transit to this state = (1-pend) * p(hit)
@@ -382,5 +380,4 @@ class TrainingEnv(SourceTracking):
                 x[1] = self.shape[1] - 1 - x[1]  # y -> -y
         else:
             raise Exception("_sym_transformation_coords is not implemented for Ndim != 2")
-        x = x.tolist()
-        return x
+        return tuple(x.tolist())
@@ -61,7 +61,8 @@ Parameters of the script are:
         - MODEL_PATH (str or None)
             path of the model (neural network) for POLICY=-1, None otherwise
         - ALPHAVEC_PATH (str or None)
-            path of the perseus or sarsop policy (alpha vectors) for POLICY=-2, None otherwise
+            path of the perseus or sarsop policy (alpha vectors) for POLICY=-2, None otherwise,
+            as written by the converters (usually .npz, see the README)
 
     - Criteria for episode termination
         - STOP_t (int > 0 or None)
@@ -79,6 +80,11 @@ Parameters of the script are:
         - N_RUNS (int > 0 or None)
             if not ADAPTIVE_N_RUNS: number of episodes to simulate, set automatically if None
 
+    - Random numbers
+        - SEED (int or None)
+            base seed of the episodes, episode i is seeded with [SEED, i] so that results do not depend on the
+            parallelization, if None each episode uses fresh entropy
+
     - Saving
         - RUN_NAME (str or None)
             prefix used for all output files, if None will use a timestamp
@@ -107,6 +113,7 @@ from copy import deepcopy
 from scipy.stats import skew as Skew
 from scipy.stats import kurtosis as Kurt
 from otto.classes.sourcetracking import SourceTracking as env
+from otto.classes._hp_numba import set_num_threads
 if 'mpi4py' in sys.modules:
     WITH_MPI = True
     import mpi4py.MPI as MPI
@@ -209,10 +216,13 @@ def autoset_numerical_parameters():
     return stop_t, Nruns, max_Nruns
 
 
-def init_envs():
+def init_envs(seed=None):
     """
     Instanciate an environment and a policy.
 
+    Args:
+        seed (int or list of int, optional): seed of the random generator of the environment (default=None)
+
     Returns:
         myenv (SourceTracking): instance of the source-tracking POMDP
         mypol (Policy): instance of the policy
@@ -220,6 +230,7 @@ def init_envs():
     myenv = env(
         R_bar=R_BAR,
         draw_source=DRAW_SOURCE,
+        seed=seed,
     )
     if POLICY == -1:
         mymodel = reload_model(MODEL_PATH, inputshape=myenv.NN_input_shape)
@@ -302,6 +313,16 @@ def cdf_to_pdf(cdf):
     return pdf
 
 
+def set_worker_threads():
+    """Use a single thread for the numba kernels if episodes already run in parallel processes.
+
+    numba reads NUMBA_NUM_THREADS when it is imported (by SourceTracking), so the number of threads is set at run
+    time instead, in the process (and thread) that computes the episodes.
+    """
+    if WITH_MPI or N_PARALLEL != 1:
+        set_num_threads(1)
+
+
 def Worker(episode):
     """
     Execute one episode.
@@ -320,6 +341,7 @@ def Worker(episode):
         failed (bool): whether the episode ended due to failure (such as infinite loop or timeout)
     """
     episode_start_time = time.monotonic()
+    set_worker_threads()
 
     stop = 0
     near_boundaries = 0
@@ -332,7 +354,7 @@ def Worker(episode):
     cdf_t[bin_t] = 0.0
     cdf_h[bin_h] = 0.0
 
-    myenv, mypol = init_envs()
+    myenv, mypol = init_envs(seed=None if SEED is None else [SEED, episode])
     check_envs(myenv, mypol)
 
     t = 0  # time step
@@ -439,6 +461,7 @@ def run():
         print("EPSILON = " + str(EPSILON))
         print("STOP_t = " + str(STOP_t))
         print("STOP_p = " + str(STOP_p))
+        print("SEED = " + str(SEED))
         print("N_PARALLEL = " + str(N_PARALLEL))
         print("WITH_MPI = " + str(WITH_MPI))
         print("ADAPTIVE_N_RUNS = " + str(ADAPTIVE_N_RUNS))
@@ -605,6 +628,7 @@ def run():
             "MODEL_PATH": MODEL_PATH,
             "STOP_t": STOP_t,
             "STOP_p": STOP_p,
+            "SEED": SEED,
             "ADAPTIVE_N_RUNS": ADAPTIVE_N_RUNS,
             "REL_TOL": REL_TOL,
             "MAX_N_RUNS": MAX_N_RUNS,
@@ -878,6 +902,10 @@ if __name__ == "__main__":
     BIN_END_H = int(BIN_END_T * R_BAR)
     LEN_CDF_H = int(np.ceil((BIN_END_H - BIN_START_H) / BIN_SIZE_H))
 
+    if POLICY == -2:
+        # load the alpha vectors once, before forking workers which then share them
+        init_envs()
+
     # run
     if WITH_MPI:
         COMM.Barrier()
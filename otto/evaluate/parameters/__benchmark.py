@@ -0,0 +1,6 @@
+# Settings shared by the benchmark parameter files, which only define their own deltas after importing this file
+# (each file ends with the N_PARALLEL guard, so that it applies to its final POLICY)
+POLICY = -2  # -1=RL, O=infotaxis, 1=space-aware infotaxis
+ADAPTIVE_N_RUNS = False  # if true, N_RUNS is increased until the estimated error is less than REL_TOL
+N_RUNS = 10000  # number of episodes to compute (starting guess if ADAPTIVE_N_RUNS)
+MAX_N_RUNS = 10000  # maximum number of runs (if ADAPTIVE_N_RUNS)
@@ -34,7 +34,8 @@ Parameters of the script are:
         - MODEL_PATH (str or None)
             path of the model (neural network) for POLICY=-1, None otherwise
         - ALPHAVEC_PATH (str or None)
-            path of the perseus policy (alpha vectors) for POLICY=-2, None otherwise
+            path of the perseus or sarsop policy (alpha vectors) for POLICY=-2, None otherwise,
+            as written by the converters (usually .npz, see the README)
 
     - Setup
         - DRAW_SOURCE (bool)
@@ -1,10 +1,11 @@
 """Load Perseus policy, extract useful data and save it."""
-import numpy as np
+import os
 import pickle
+from otto.classes.alphavecconversion import convert_alphavecs, save
 
 FILENAME = "vf_rate_5.0_gamma_0.98_ic2_it_21_shaping_factor_0.1_shaping_power_1.0_nb_45000_epsilon_0.0_v2.pkl"
 INPUT_FILENAME = "/home/aurore/Downloads/" + FILENAME
-OUTPUT_FILENAME = "./" + FILENAME
+OUTPUT_FILENAME = "./" + os.path.splitext(FILENAME)[0] + ".npz"  # ".npz.zst" for zstd, no extension for .npy files
 OUTPUT = {
     "solver": "Perseus",
     "alphas": None,
@@ -13,30 +14,17 @@ OUTPUT = {
     "shaping": "D",
     "shaping_coef": 0.1,
 }
+SPARSE_DENSITY = 0.3  # alpha vectors are saved in CSR format if the fraction of nonzero weights is lower than this
+PRUNE = False  # remove the alpha vectors dominated by another one (exact, slower for large policies)
 
 
 def convert(input_filename, output):
     with open(input_filename, 'rb') as f:
         vf = pickle.load(f)
-    output["alphas"] = []
-    output["actions"] = []
-    for alphavec in vf.alphas:
-        output["alphas"].append(alphavec.data)
-        if np.array_equal(alphavec.action, [1, 0]):
-            action = 1
-        elif np.array_equal(alphavec.action, [-1, 0]):
-            action = 0
-        elif np.array_equal(alphavec.action, [0, 1]):
-            action = 3
-        elif np.array_equal(alphavec.action, [0, -1]):
-            action = 2
-        else:
-            raise Exception("This action is not defined")
-        output["actions"].append(action)
-    return output
+    alphavecs = vf.alphas
+    return convert_alphavecs(alphavecs, output, prune=PRUNE, sparse_density=SPARSE_DENSITY)
 
 
 if __name__ == "__main__":
     OUTPUT = convert(INPUT_FILENAME, OUTPUT)
-    with open(OUTPUT_FILENAME, 'wb') as f:
-        pickle.dump(OUTPUT, f, pickle.HIGHEST_PROTOCOL)
+    save(OUTPUT, OUTPUT_FILENAME)
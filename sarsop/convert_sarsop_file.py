@@ -1,10 +1,11 @@
 """Load Sarsop policy, extract useful data and save it."""
-import numpy as np
+import os
 import pickle
+from otto.classes.alphavecconversion import convert_alphavecs, save
 
 FILENAME = "sarsop_policy_windy_unshaped.pkl"
 INPUT_FILENAME = "/home/aurore/Downloads/" + FILENAME
-OUTPUT_FILENAME = "./" + FILENAME
+OUTPUT_FILENAME = "./" + os.path.splitext(FILENAME)[0] + ".npz"  # ".npz.zst" for zstd, no extension for .npy files
 OUTPUT = {
     "solver": "Sarsop",
     "alphas": None,
@@ -13,30 +14,16 @@ OUTPUT = {
     "shaping": "0",
     "shaping_coef": '',
 }
+SPARSE_DENSITY = 0.3  # alpha vectors are saved in CSR format if the fraction of nonzero weights is lower than this
+PRUNE = False  # remove the alpha vectors dominated by another one (exact, slower for large policies)
 
 
 def convert(input_filename, output):
     with open(input_filename, 'rb') as f:
         alphavecs = pickle.load(f)  # list of alpha_vec
-    output["alphas"] = []
-    output["actions"] = []
-    for alphavec in alphavecs:
-        output["alphas"].append(alphavec.data)
-        if np.array_equal(alphavec.action, [1, 0]):
-            action = 1
-        elif np.array_equal(alphavec.action, [-1, 0]):
-            action = 0
-        elif np.array_equal(alphavec.action, [0, 1]):
-            action = 3
-        elif np.array_equal(alphavec.action, [0, -1]):
-            action = 2
-        else:
-            raise Exception("This action is not defined")
-        output["actions"].append(action)
-    return output
+    return convert_alphavecs(alphavecs, output, prune=PRUNE, sparse_density=SPARSE_DENSITY)
 
 
 if __name__ == "__main__":
     OUTPUT = convert(INPUT_FILENAME, OUTPUT)
-    with open(OUTPUT_FILENAME, 'wb') as f:
-        pickle.dump(OUTPUT, f, pickle.HIGHEST_PROTOCOL)
+    save(OUTPUT, OUTPUT_FILENAME)
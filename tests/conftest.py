@@ -0,0 +1,5 @@
+import os
+import sys
+
+# tests run against the source tree, otto does not need to be installed
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
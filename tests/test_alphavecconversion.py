@@ -0,0 +1,42 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from scipy.sparse import csr_matrix
+
+from otto.classes.alphavecpolicy import AlphaVecPolicy
+from otto.classes.alphavecconversion import ACTIONS, convert_alphavecs, save
+
+EXTENSIONS = [".npz", ".npz.zst", ""]  # "" is a directory of .npy files
+
+
+def converted_policy(sparse):
+    rng = np.random.default_rng(0)
+    alphas = rng.standard_normal((12, 9, 7)) * (rng.random((12, 9, 7)) < 0.1)
+    actions = rng.integers(len(ACTIONS), size=len(alphas))
+    alphavecs = [SimpleNamespace(data=alpha, action=ACTIONS[action]) for alpha, action in zip(alphas, actions)]
+    output = {"solver": "Perseus", "discount": 0.99, "shaping": "0", "shaping_coef": 0.0}
+    output = convert_alphavecs(alphavecs, output, sparse_density=0.3 if sparse else 0.0)
+    assert ("alphas_data" in output) == sparse
+    return output, alphas, actions
+
+
+@pytest.mark.parametrize("sparse", [False, True])
+@pytest.mark.parametrize("extension", EXTENSIONS)
+def test_save_load_round_trip(extension, sparse, tmp_path):
+    if extension.endswith(".zst"):
+        pytest.importorskip("zstandard")
+    output, alphas, actions = converted_policy(sparse)
+    filename = str(tmp_path / ("policy" + extension))
+    save(output, filename)
+
+    loaded = object.__new__(AlphaVecPolicy)._load(filename)
+    for key in ("solver", "discount", "shaping", "shaping_coef"):
+        assert loaded[key] == output[key]
+    np.testing.assert_array_equal(loaded["actions"], actions)
+    if sparse:
+        assert isinstance(loaded["alphas"], csr_matrix)
+        assert loaded["alphas_shape"] == alphas.shape
+        np.testing.assert_array_equal(loaded["alphas"].toarray().reshape(alphas.shape), alphas)
+    else:
+        np.testing.assert_array_equal(loaded["alphas"], alphas)
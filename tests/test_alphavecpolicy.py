@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+from scipy.sparse import csr_matrix
+
+from otto.classes.sourcetracking import SourceTracking
+from otto.classes.alphavecpolicy import AlphaVecPolicy, ValueFunction
+from otto.classes.alphavecconversion import save
+
+
+def reference_belief(p, agent):
+    # original construction of the belief, with pad/flip/roll
+    dims = p.shape
+    b = np.pad(p, ((0, dims[0] - 1), (0, dims[1] - 1)))
+    b = np.flip(b)
+    b = np.roll(b, (1 + agent[0], 1 + agent[1]), axis=(0, 1))
+    return b
+
+
+@pytest.fixture
+def policy(tmp_path):
+    env = SourceTracking(R_bar=2.5)
+    rng = np.random.default_rng(0)
+    output = {"solver": "Perseus", "discount": 0.99, "shaping": "0", "shaping_coef": 0.0,
+              "alphas": rng.random((8,) + tuple(2 * n - 1 for n in env.shape)),
+              "actions": rng.integers(4, size=8).astype(np.int8)}
+    filename = str(tmp_path / "policy.npz")
+    save(output, filename)
+    return AlphaVecPolicy(env, filename)
+
+
+def agents(shape):
+    # corners, edges and center
+    return [(x, y) for x in (0, shape[0] // 2, shape[0] - 1) for y in (0, shape[1] // 3, shape[1] - 1)]
+
+
+def test_alphavec_belief_matches_pad_flip_roll(policy):
+    rng = np.random.default_rng(1)
+    for agent in agents(policy.env.shape):
+        p = rng.random(policy.env.shape)
+        np.testing.assert_array_equal(policy._alphavec_belief(p, agent), reference_belief(p, agent))
+
+
+def test_alphavec_belief_batch_matches_pad_flip_roll(policy):
+    rng = np.random.default_rng(2)
+    batch_agents = np.array(agents(policy.env.shape))
+    p_sources = rng.random((len(batch_agents),) + policy.env.shape)
+    beliefs = policy._alphavec_belief_batch(p_sources, batch_agents)
+    for p, agent, belief in zip(p_sources, batch_agents, beliefs):
+        np.testing.assert_array_equal(belief, reference_belief(p, agent))
+
+
+VF_MODES = {
+    "float64": dict(),
+    "float32": dict(low_precision=True),
+    "int8": dict(low_precision="int8"),
+    "sparse": dict(sparse=True),
+}
+
+
+def alphas_and_beliefs(n_alphas=200, shape=(9, 7), n_beliefs=50, density=0.2):
+    rng = np.random.default_rng(3)
+    alphas = rng.standard_normal((n_alphas,) + shape) * (rng.random((n_alphas,) + shape) < density)
+    actions = rng.integers(4, size=n_alphas)
+    beliefs = rng.random((n_beliefs,) + shape)
+    beliefs /= beliefs.sum(axis=(1, 2), keepdims=True)
+    return alphas, actions, beliefs
+
+
+def reference_value(alphas, belief):
+    # float64 reference: value of the best alpha vector
+    dot = alphas.reshape(len(alphas), -1) @ belief.ravel()
+    return np.max(dot), np.argmax(dot)
+
+
+@pytest.mark.parametrize("parallel", [True, False])
+@pytest.mark.parametrize("mode", sorted(VF_MODES))
+def test_value_function_modes_match_float64(mode, parallel):
+    alphas, actions, beliefs = alphas_and_beliefs()
+    vf = ValueFunction(alphas, actions, **VF_MODES[mode])
+    for belief in beliefs:
+        value, index = vf.value(belief, parallel=parallel)
+        value_ref, index_ref = reference_value(alphas, belief)
+        assert index == index_ref
+        assert value == pytest.approx(value_ref, rel=1e-12, abs=1e-12)
+
+
+def test_value_function_csr_input_matches_float64():
+    alphas, actions, beliefs = alphas_and_beliefs()
+    vf = ValueFunction(csr_matrix(alphas.reshape(len(alphas), -1)), actions)
+    assert vf.alpha_array is None and vf.sparse
+    for belief in beliefs:
+        value, index = vf.value(belief)
+        value_ref, index_ref = reference_value(alphas, belief)
+        assert index == index_ref
+        assert value == pytest.approx(value_ref, rel=1e-12, abs=1e-12)
+
+
+@pytest.mark.parametrize("csr", [False, True])
+def test_value_batch_matches_float64(csr):
+    alphas, actions, beliefs = alphas_and_beliefs()
+    vf = ValueFunction(csr_matrix(alphas.reshape(len(alphas), -1)) if csr else alphas, actions)
+    values, indices = vf.value_batch(beliefs)
+    for belief, value, index in zip(beliefs, values, indices):
+        value_ref, index_ref = reference_value(alphas, belief)
+        assert index == index_ref
+        assert value == pytest.approx(value_ref, rel=1e-12, abs=1e-12)
@@ -0,0 +1,19 @@
+import multiprocessing
+
+import pytest
+
+pytest.importorskip("matplotlib")
+numba = pytest.importorskip("numba")
+
+import otto.evaluate.evaluate as evaluate
+
+
+def worker_threads(_):
+    evaluate.set_worker_threads()
+    return numba.get_num_threads()
+
+
+def test_parallel_episodes_use_one_numba_thread(monkeypatch):
+    monkeypatch.setattr(evaluate, "N_PARALLEL", 2)
+    with multiprocessing.get_context("fork").Pool(2) as pool:
+        assert pool.map(worker_threads, range(2)) == [1, 1]
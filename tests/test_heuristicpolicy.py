@@ -0,0 +1,71 @@
+import multiprocessing
+
+import numpy as np
+import pytest
+
+from otto.classes.sourcetracking import SourceTracking
+from otto.classes.heuristicpolicy import HeuristicPolicy, REL_TOL_CHOICE
+from otto.classes._hp_numba import NUMBA_AVAILABLE, set_num_threads
+
+METHODS = {0: "_infotaxis", 1: "_space_aware_infotaxis", 7: "_mean_distance_policy"}
+
+
+def random_belief(env, rng):
+    p = rng.random(env.shape) * (rng.random(env.shape) < 0.3)
+    p[env.agent] = 0.0
+    return (p / p.sum()).astype(env.p_source.dtype)
+
+
+@pytest.mark.skipif(not NUMBA_AVAILABLE, reason="numba is not installed")
+@pytest.mark.parametrize("policy", sorted(METHODS))
+def test_numba_kernels_match_numpy(policy):
+    env = SourceTracking(R_bar=2.5)
+    numba_policy = HeuristicPolicy(env, policy)
+    numpy_policy = HeuristicPolicy(env, policy)
+    numpy_policy._use_numba = False
+    assert numba_policy._use_numba
+
+    rng = np.random.default_rng(0)
+    agents = [env.agent, (0, 0), (env.shape[0] - 1, env.shape[1] // 2)]  # center, corner, edge
+    for agent in agents:
+        env.agent = agent
+        env.p_source = random_belief(env, rng)
+        env.entropy = float(env._entropy(env.p_source))
+        action_numba, values_numba = getattr(numba_policy, METHODS[policy])()
+        action_numpy, values_numpy = getattr(numpy_policy, METHODS[policy])()
+        values_numba = np.asarray(values_numba, dtype=float)
+        values_numpy = np.asarray(values_numpy, dtype=float)
+        assert np.array_equal(np.isfinite(values_numba), np.isfinite(values_numpy))
+        finite = np.isfinite(values_numpy)
+        # float32 rounding errors, relative to the entropy for infotaxis
+        np.testing.assert_allclose(values_numba[finite], values_numpy[finite], rtol=1e-5,
+                                   atol=REL_TOL_CHOICE * max(1.0, env.entropy))
+        assert action_numba == action_numpy
+
+
+def test_near_ties_choose_first_action():
+    env = SourceTracking(R_bar=2.5)
+    policy = HeuristicPolicy(env, 6)  # greedy
+    p = np.zeros(env.shape, dtype=env.p_source.dtype)
+    x, y = env.agent
+    p[x - 1, y] = p[x + 1, y] = p[x, y - 1] = p[x, y + 1] = 0.25  # symmetric neighbors: all actions tied
+    env.p_source = p
+    action, _ = policy._greedy_policy()
+    assert action == 0
+
+
+def one_thread_decision(seed):
+    # runs in a worker process, as the episodes of evaluate.py
+    import numba
+    set_num_threads(1)
+    env = SourceTracking(R_bar=2.5)
+    env.p_source = random_belief(env, np.random.default_rng(seed))
+    action, _ = HeuristicPolicy(env, 0)._infotaxis()
+    return numba.get_num_threads(), action
+
+
+@pytest.mark.skipif(not NUMBA_AVAILABLE, reason="numba is not installed")
+def test_worker_processes_use_one_thread():
+    with multiprocessing.get_context("fork").Pool(2) as pool:
+        results = pool.map(one_thread_decision, range(2))
+    assert [n_threads for n_threads, _ in results] == [1, 1]
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+from scipy.stats import poisson
+
+import otto.classes.sourcetracking as sourcetracking
+from otto.classes.sourcetracking import SourceTracking
+from otto.classes._st_numba import NUMBA_AVAILABLE, draw_poisson_hit
+
+
+@pytest.mark.skipif(not NUMBA_AVAILABLE, reason="numba is not installed")
+@pytest.mark.parametrize("hit", [0, 1])
+def test_fused_update_matches_numpy(hit, monkeypatch):
+    env_numba = SourceTracking(R_bar=2.5)
+    env_numpy = SourceTracking(R_bar=2.5)
+    rng = np.random.default_rng(0)
+    p = rng.random(env_numba.shape).astype(env_numba.p_source.dtype)
+    p /= p.sum()
+    for env in (env_numba, env_numpy):
+        env.p_source = p.copy()
+        env.agent = (3, 5)
+
+    env_numba._update_p_source(hit=hit, done=False)
+    monkeypatch.setattr(sourcetracking, "NUMBA_AVAILABLE", False)
+    env_numpy._update_p_source(hit=hit, done=False)
+
+    assert env_numba.p_source.dtype == env_numpy.p_source.dtype
+    assert env_numba.p_source[env_numba.agent] == 0.0
+    np.testing.assert_allclose(env_numba.p_source, env_numpy.p_source, rtol=1e-5, atol=1e-12)
+    np.testing.assert_allclose(env_numba.entropy, env_numpy.entropy, rtol=1e-5)
+
+
+@pytest.mark.parametrize("mu", [0.0, 0.1, 1.5, 10.0])
+def test_draw_poisson_hit_inverts_the_cdf(mu):
+    Nhits = 4
+    cdf = poisson.cdf(np.arange(Nhits - 1), mu)
+    for u in np.random.default_rng(0).random(200):
+        expected = int(np.searchsorted(cdf, u, side="right"))  # first h with u < cdf[h], else Nhits - 1
+        assert draw_poisson_hit(mu, u, Nhits) == expected